@@ -0,0 +1,8 @@
+'''
+Benchmarks for reistee. Run from the main folder of the repository:
+
+    python -m benchmarks.generate class.zip --students 30
+    python -m benchmarks.run class.zip --converter fake
+    python -m benchmarks.assembly
+    python -m benchmarks.heic
+'''
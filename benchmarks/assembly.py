@@ -0,0 +1,175 @@
+'''
+Compares the time and peak memory for assembling the combined pdf of 
+one student with the old way (every picture written to its own _imgpdf_
+file, merged into _img_.pdf, pdfs merged into _pdfs_.pdf, then 
+everything merged again into the combined pdf), the single-pass 
+assembly of reistee in memory and the page by page assembly reistee 
+uses for students larger than its memory budget.
+
+Usage: python -m benchmarks.assembly [--pictures N] [--pdfs N] ...
+'''
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fpdf import FPDF
+from PIL import Image
+from PyPDF2 import PdfFileMerger
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import reistee
+
+
+def create_student_folder(student_folder, pictures, pdfs, pages, size):
+    '''
+    Creates a student folder with random pictures and pdfs with text.
+    Returns the list of pictures and the list of pdfs.
+    '''
+
+    os.makedirs(student_folder)
+    random.seed(0)
+    picture_files = []
+    pdf_files = []
+
+    for number in range(pictures):
+        picture_file = os.path.join(student_folder, "Foto%d.jpg" % number)
+        noise = os.urandom(size[0] * size[1] * 3 // 64)
+        im = Image.frombytes("RGB", (size[0] // 8, size[1] // 8), noise)
+        im.resize(size).save(picture_file, quality=90)
+        picture_files.append(picture_file)
+
+    for number in range(pdfs):
+        pdf_file = os.path.join(student_folder, "Aufgabe%d.pdf" % number)
+        pdf = FPDF()
+        pdf.set_font("Arial", size=12)
+        for page in range(pages):
+            pdf.add_page()
+            for line in range(40):
+                pdf.cell(0, 6, "Aufgabe %d Seite %d Zeile %d" 
+                    % (number, page, line), ln=1)
+        pdf.output(pdf_file, "F")
+        pdf_files.append(pdf_file)
+
+    return picture_files, pdf_files
+
+
+def legacy_assembly(curr_student, picture_files, pdf_files):
+    '''
+    The assembly as done by reistee before single-pass assembly, with 
+    all intermediate files.
+    '''
+
+    pdf_list = []
+
+    for counter, picture_file in enumerate(picture_files, 1):
+        cover = reistee.image_transpose_exif(Image.open(picture_file))
+        cover.save(picture_file)
+        width, height = cover.size
+        pdf = FPDF(unit = "pt", format = [width, height])
+        pdf.add_page()
+        pdf.image(picture_file, 0, 0)
+        pdf.output(curr_student + "_imgpdf_" + str(counter) + ".pdf", "F")
+        pdf_list.append(curr_student + "_imgpdf_" + str(counter) + ".pdf")
+
+    img_merger = PdfFileMerger(strict=False)
+    for pdf in pdf_list:
+        img_merger.append(pdf)
+    img_merger.write(curr_student + "_img_.pdf")
+    img_merger.close()
+
+    for pdf in pdf_list:
+        os.remove(pdf)
+
+    pdf_merger = PdfFileMerger(strict=False)
+    for pdf in pdf_files:
+        pdf_merger.append(pdf)
+    pdf_merger.write(curr_student + "_pdfs_.pdf")
+    pdf_merger.close()
+
+    fullmerger = PdfFileMerger(strict=False)
+    fullmerger.append(curr_student + "_pdfs_.pdf")
+    fullmerger.append(curr_student + "_img_.pdf")
+    fullmerger.write(os.path.join(os.path.dirname(curr_student), 
+        reistee.reverse_student_name(curr_student) + ".pdf"))
+    fullmerger.close()
+
+    os.remove(curr_student + "_pdfs_.pdf")
+    os.remove(curr_student + "_img_.pdf")
+
+
+def single_pass_assembly(curr_student, picture_files, pdf_files):
+    '''
+    The assembly as done by reistee now, in memory.
+    '''
+
+    reistee.memory_budget = 0
+    page_sources = reistee.merge_files_per_category(curr_student,
+        (list(picture_files), list(pdf_files), []))
+    reistee.merge_categories(curr_student, page_sources)
+
+
+def streaming_assembly(curr_student, picture_files, pdf_files):
+    '''
+    The assembly as done by reistee now for students larger than the 
+    memory budget, page by page.
+    '''
+
+    reistee.memory_budget = 1
+    page_sources = reistee.merge_files_per_category(curr_student,
+        (list(picture_files), list(pdf_files), []))
+    reistee.merge_categories(curr_student, page_sources)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pictures", type=int, default=20)
+    parser.add_argument("--pdfs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=10,
+        help="pages per pdf")
+    parser.add_argument("--size", type=int, nargs=2, default=(2000, 1500),
+        help="width and height of the pictures")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, assembly in (("legacy", legacy_assembly), 
+            ("single-pass", single_pass_assembly),
+            ("streaming", streaming_assembly)):
+        times = []
+
+        # the last run measures the peak memory, which slows it down
+        for run in range(args.repeat + 1):
+            work_dir = tempfile.mkdtemp(prefix="reistee-bench-")
+            try:
+                curr_student = os.path.join(work_dir, "Max Mustermann")
+                picture_files, pdf_files = create_student_folder(
+                    curr_student, args.pictures, args.pdfs, args.pages, 
+                    tuple(args.size))
+
+                if run == args.repeat:
+                    tracemalloc.start()
+                    assembly(curr_student, picture_files, pdf_files)
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    start = time.perf_counter()
+                    assembly(curr_student, picture_files, pdf_files)
+                    times.append(time.perf_counter() - start)
+
+                size = os.path.getsize(os.path.join(work_dir, 
+                    "Mustermann, Max.pdf"))
+            finally:
+                shutil.rmtree(work_dir)
+
+        print("%-12s best %7.3f s  mean %7.3f s  peak %7.1f MB  "
+            "output %9d bytes" % (name, min(times), sum(times) / 
+            len(times), peak / 1024 / 1024, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+'''
+Creates a zip that looks like a download of student solutions from
+IServ: one folder "Firstname Lastname" per student, with a mix of large
+phone photos (rotated by exif metadata), screenshots, multi-page pdfs,
+text files and odt documents. Some students put files in subfolders,
+upload files twice or upload damaged pictures.
+
+Usage: python -m benchmarks.generate class.zip [--students N] ...
+'''
+
+import argparse
+import io
+import random
+import zipfile
+
+from fpdf import FPDF
+from PIL import Image, ImageDraw
+
+
+FIRST_NAMES = ["Anna", "Ben", "Carla", "David", "Emma", "Finn", "Greta",
+    "Hannah", "Jonas", "Lea", "Leon", "Marie", "Mia", "Noah", "Paul",
+    "Sophie", "Tim", "Zoe", "Lukas", "Ella"]
+
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber",
+    "Meyer", "Wagner", "Becker", "Schulz", "Hoffmann", "Koch", "Bauer",
+    "Richter", "Klein", "Wolf", "Schröder", "Neumann", "Schwarz"]
+
+SUBFOLDERS = ["Aufgaben", "Hausaufgabe", "Aufgaben/Teil 2", "Fotos"]
+
+TEXT = ("Die Lösung der Aufgabe ergibt sich aus der Gleichung. Größere "
+    "Werte führen zu äußerst ungenauen Ergebnissen, daher wählen wir "
+    "kleine Schritte. ")
+
+
+def photo(rng, size):
+    '''
+    Returns a jpg that looks roughly like a photo of a worksheet: a
+    lit paper with lines of "handwriting", noise and a random exif
+    rotation, like phones store sideways pictures.
+    '''
+
+    width, height = size
+    small = Image.new("L", (width // 16, height // 16), 200)
+    draw = ImageDraw.Draw(small)
+
+    for line in range(4, height // 16 - 4, 3):
+        x = rng.randint(2, 10)
+        draw.line((x, line, rng.randint(width // 32, width // 16 - 4),
+            line), fill=rng.randint(40, 90))
+
+    noise = Image.frombytes("L", small.size,
+        rng.randbytes(small.size[0] * small.size[1]))
+    small = Image.blend(small, noise, 0.15)
+    tint = tuple(rng.randint(170, 255) for channel in range(3))
+    im = Image.merge("RGB", [small.point(lambda v, t=t: v * t // 255)
+        for t in tint]).resize(size, Image.BICUBIC)
+
+    exif = im.getexif()
+    exif[0x0112] = rng.choice([1, 3, 6, 6, 8])
+
+    data = io.BytesIO()
+    im.save(data, "JPEG", quality=rng.randint(85, 95), exif=exif)
+    return data.getvalue()
+
+
+def screenshot(rng):
+    '''
+    Returns a png with flat colors, like a screenshot.
+    '''
+
+    im = Image.new("RGB", (rng.choice([1280, 1920]),
+        rng.choice([720, 1080])), "white")
+    draw = ImageDraw.Draw(im)
+
+    for box in range(rng.randint(5, 20)):
+        x, y = rng.randint(0, im.width - 100), rng.randint(0, im.height - 30)
+        draw.rectangle((x, y, x + rng.randint(50, 400),
+            y + rng.randint(10, 200)), fill=tuple(rng.randint(0, 255)
+            for channel in range(3)))
+        draw.text((x + 5, y + 5), "Aufgabe %d" % box, fill="black")
+
+    data = io.BytesIO()
+    im.save(data, "PNG")
+    return data.getvalue()
+
+
+def pdf(rng, pages):
+    '''
+    Returns a pdf with text on every page.
+    '''
+
+    document = FPDF()
+    document.set_font("Arial", size=11)
+
+    for page in range(pages):
+        document.add_page()
+        for line in range(rng.randint(20, 45)):
+            document.cell(0, 6, TEXT[:rng.randint(30, len(TEXT))], ln=1)
+
+    return document.output(dest="S").encode("latin-1")
+
+
+def text(rng):
+    '''
+    Returns a text file with umlauts, in utf-8 or windows encoding.
+    '''
+
+    content = "\r\n".join(TEXT * rng.randint(1, 3)
+        for line in range(rng.randint(2, 60)))
+
+    return content.encode(rng.choice(["utf-8", "cp1252"]))
+
+
+def odt(rng):
+    '''
+    Returns a minimal odt document with some paragraphs.
+    '''
+
+    paragraphs = "".join("<text:p>%s</text:p>" % TEXT
+        for paragraph in range(rng.randint(3, 40)))
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as document:
+        document.writestr(zipfile.ZipInfo("mimetype"),
+            "application/vnd.oasis.opendocument.text")
+        document.writestr("META-INF/manifest.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:'
+            'opendocument:xmlns:manifest:1.0" manifest:version="1.2">'
+            '<manifest:file-entry manifest:full-path="/" manifest:media-'
+            'type="application/vnd.oasis.opendocument.text"/>'
+            '<manifest:file-entry manifest:full-path="content.xml" '
+            'manifest:media-type="text/xml"/></manifest:manifest>')
+        document.writestr("content.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<office:document-content xmlns:office="urn:oasis:names:tc:'
+            'opendocument:xmlns:office:1.0" xmlns:text="urn:oasis:names:'
+            'tc:opendocument:xmlns:text:1.0" office:version="1.2">'
+            '<office:body><office:text>' + paragraphs +
+            '</office:text></office:body></office:document-content>')
+
+    return data.getvalue()
+
+
+def generate_archive(path, students=30, photos=4, screenshots=1, pdfs=1,
+                     pdf_pages=4, texts=1, odts=1, nested=0.3,
+                     duplicates=0.2, corrupt=0.05,
+                     photo_size=(4032, 3024), seed=0):
+    '''
+    Writes a zip like an IServ download to path. The numbers of files
+    are per student, nested, duplicates and corrupt are probabilities
+    per file. Returns a dict with the number of files and bytes.
+    '''
+
+    rng = random.Random(seed)
+    names = set()
+    stats = {"students": students, "files": 0, "bytes": 0}
+
+    while len(names) < students:
+        names.add(rng.choice(FIRST_NAMES) + " " + rng.choice(LAST_NAMES))
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+
+        def add(name, data):
+            archive.writestr(name, data)
+            stats["files"] += 1
+            stats["bytes"] += len(data)
+
+        for student in sorted(names):
+            files = []
+            files += [("IMG_%04d.jpg" % rng.randint(0, 9999),
+                photo(rng, photo_size)) for number in range(photos)]
+            files += [("Bildschirmfoto %d.png" % number, screenshot(rng))
+                for number in range(screenshots)]
+            files += [("Aufgabe_%d.pdf" % (number + 1),
+                pdf(rng, rng.randint(1, 2 * pdf_pages - 1)))
+                for number in range(pdfs)]
+            files += [("Notizen-%d.txt" % number, text(rng))
+                for number in range(texts)]
+            files += [("Lösung %d.odt" % (number + 1), odt(rng))
+                for number in range(odts)]
+
+            for filename, data in files:
+
+                if rng.random() < corrupt:
+                    data = data[:len(data) // 3]
+
+                if rng.random() < nested:
+                    filename = rng.choice(SUBFOLDERS) + "/" + filename
+
+                add(student + "/" + filename, data)
+
+                if rng.random() < duplicates:
+                    base, dot, ext = filename.rpartition(".")
+                    add(student + "/" + base + " (1)." + ext, data)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="zip-file to create")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--photos", type=int, default=4,
+        help="jpg photos per student")
+    parser.add_argument("--screenshots", type=int, default=1,
+        help="png screenshots per student")
+    parser.add_argument("--pdfs", type=int, default=1,
+        help="pdfs per student")
+    parser.add_argument("--pdf-pages", type=int, default=4,
+        help="average pages per pdf")
+    parser.add_argument("--texts", type=int, default=1,
+        help="txt files per student")
+    parser.add_argument("--odts", type=int, default=1,
+        help="odt documents per student")
+    parser.add_argument("--nested", type=float, default=0.3,
+        help="probability of a file being in a subfolder")
+    parser.add_argument("--duplicates", type=float, default=0.2,
+        help="probability of a file being uploaded twice")
+    parser.add_argument("--corrupt", type=float, default=0.05,
+        help="probability of a file being damaged")
+    parser.add_argument("--photo-size", type=int, nargs=2,
+        default=(4032, 3024))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats = generate_archive(args.path, args.students, args.photos,
+        args.screenshots, args.pdfs, args.pdf_pages, args.texts, args.odts,
+        args.nested, args.duplicates, args.corrupt, tuple(args.photo_size),
+        args.seed)
+
+    print("%s: %d students, %d files, %.1f MB" % (args.path,
+        stats["students"], stats["files"], stats["bytes"] / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+'''
+Compares the throughput of converting heic photos into pdf pages with
+pillow-heif inside reistee (in threads, see reistee.pic_to_pdf) and
+with one ImageMagick process per photo, which writes a jpg that is
+then converted like any other jpg.
+
+Usage: python -m benchmarks.heic [--photos N] [--threads N] ...
+'''
+
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+
+import reistee
+from benchmarks.generate import photo
+
+
+def create_heic_photos(folder, photos, size):
+    '''
+    Writes photos heic images that look like photos of worksheets into
+    folder. Returns the list of their paths.
+    '''
+
+    rng = random.Random(0)
+    heic_files = []
+
+    for number in range(photos):
+        heic_file = os.path.join(folder, "IMG_%04d.heic" % number)
+        with Image.open(io.BytesIO(photo(rng, size))) as im:
+            im.save(heic_file, "HEIF", quality=90, exif=im.getexif())
+        heic_files.append(heic_file)
+
+    return heic_files
+
+
+def in_process(curr_student, heic_files):
+    '''
+    Converts the photos like reistee does with pillow-heif installed.
+    '''
+
+    return reistee.pic_to_pdf(curr_student, heic_files)
+
+
+def subprocess_per_photo(curr_student, heic_files):
+    '''
+    Converts the photos like reistee does without pillow-heif: one
+    ImageMagick process per photo, then the jpg is converted.
+    '''
+
+    pages = []
+
+    for heic_file in heic_files:
+        jpg = reistee.heic_to_jpg(heic_file)
+        jpg_file = heic_file[0:-5] + ".jpg"
+
+        with open(jpg_file, "wb") as jpg_out:
+            jpg_out.write(jpg)
+
+        pages.append(reistee.picture_to_page(jpg_file))
+
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--photos", type=int, default=12)
+    parser.add_argument("--size", type=int, nargs=2, default=(4032, 3024),
+        help="width and height of the photos")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1,
+        help="picture threads of reistee (default: number of cores)")
+    parser.add_argument("--dpi", type=int, default=150)
+    args = parser.parse_args()
+
+    if not reistee.heic_supported():
+        print("pillow-heif is not installed, it is needed for creating "
+            "the heic photos.")
+        return
+
+    reistee.image_dpi = args.dpi
+    reistee.picture_threads = args.threads
+    reistee.cache_folder = ""
+
+    work_dir = tempfile.mkdtemp(prefix="reistee-bench-")
+
+    try:
+        curr_student = os.path.join(work_dir, "Max Mustermann")
+        os.makedirs(curr_student)
+        heic_files = create_heic_photos(curr_student, args.photos,
+            tuple(args.size))
+        size = sum(os.path.getsize(heic_file) for heic_file in heic_files)
+
+        paths = [("pillow-heif", in_process)]
+
+        if shutil.which("magick"):
+            paths.append(("magick", subprocess_per_photo))
+        else:
+            print("ImageMagick is not installed, the subprocess path is "
+                "skipped.")
+
+        for name, convert in paths:
+            start = time.perf_counter()
+            convert(curr_student, heic_files)
+            seconds = time.perf_counter() - start
+
+            print("%-12s %7.3f s  %6.2f photos/s  %6.2f MB/s" % (name,
+                seconds, args.photos / seconds,
+                size / seconds / 1024 / 1024))
+
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
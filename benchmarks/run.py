@@ -0,0 +1,274 @@
+'''
+Runs reistee on a zip stage by stage and measures the time of every
+stage, the peak memory, the size of the output and how long python
+takes to import reistee. The results are
+saved as json, so runs on different commits can be compared.
+
+Usage: python -m benchmarks.run class.zip [--converter fake] ...
+'''
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+import zipfile
+
+import reistee
+
+
+def git_commit():
+    '''
+    Returns the current commit of the repository, or "unknown".
+    '''
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def peak_rss():
+    '''
+    Returns the peak memory of this process and of its finished child
+    processes (e.g. workers) in bytes, None if it can't be measured.
+    '''
+
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset, None
+        except (ImportError, AttributeError):
+            return None, None
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 1 if sys.platform == "darwin" else 1024
+
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit)
+
+
+def startup_time(repeats=5):
+    '''
+    Returns how long a new python process takes to import reistee in
+    seconds, the best of repeats runs. This is most of the time the exe
+    needs before it starts working on a zip.
+    '''
+
+    times = []
+
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import reistee"], check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def folder_size(folder):
+    '''
+    Returns the number of files and their size in bytes in folder.
+    '''
+
+    files = 0
+    size = 0
+
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, filename))
+
+    return files, size
+
+
+def timed(stages, name, function):
+    '''
+    Returns function wrapped, so the time of every call is added to
+    stages[name].
+    '''
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stages[name] = (stages.get(name, 0) +
+                time.perf_counter() - start)
+
+    return wrapper
+
+
+def run_stages(zip_path, work_dir):
+    '''
+    Extracts the zip and runs every step of reistee for every student
+    one after another. Returns the time of every stage in seconds. 
+    Students that fail (e.g. with a damaged pdf, see 
+    benchmarks.generate) are printed and skipped, like 
+    reistee.process_student does; the time until the error is counted.
+    '''
+
+    stages = {}
+    dir_name = os.path.join(work_dir, "stages")
+
+    # conversions run inside merge_files_per_category, they are measured
+    # separately and taken out of its time below
+    original_functions = reistee.pic_to_pdf, reistee.doc_to_pdf
+    reistee.pic_to_pdf = timed(stages, "pic_to_pdf", reistee.pic_to_pdf)
+    reistee.doc_to_pdf = timed(stages, "doc_to_pdf", reistee.doc_to_pdf)
+
+    try:
+        start = time.perf_counter()
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            zip_ref.extractall(dir_name)
+        stages["extract"] = time.perf_counter() - start
+
+        student_folders = sorted(f.path for f in os.scandir(dir_name)
+            if f.is_dir())
+
+        for student_folder in student_folders:
+            try:
+                categorized_files = timed(stages, "iterate_and_categorize",
+                    reistee.iterate_and_categorize)(student_folder)
+                page_sources = timed(stages, "merge_files_per_category",
+                    reistee.merge_files_per_category)(student_folder,
+                    categorized_files)
+                timed(stages, "merge_categories", 
+                    reistee.merge_categories)(student_folder, page_sources)
+
+            except Exception:
+                print("Error while processing " + 
+                    os.path.basename(student_folder) + ":\n" + 
+                    traceback.format_exc())
+
+        reistee.close_converter()
+
+    finally:
+        reistee.pic_to_pdf, reistee.doc_to_pdf = original_functions
+
+    stages["merge_files_per_category"] = (
+        stages.get("merge_files_per_category", 0) - 
+        stages.get("pic_to_pdf", 0) - stages.get("doc_to_pdf", 0))
+
+    return stages
+
+
+def compare(old_results, new_results):
+    '''
+    Prints the times of two runs side by side.
+    '''
+
+    print("%-26s %10s %10s %8s" % ("", old_results["commit"],
+        new_results["commit"], "change"))
+
+    rows = [(stage, old_results["stages"].get(stage),
+        new_results["stages"].get(stage))
+        for stage in new_results["stages"]]
+    rows += [(name, old_results.get(name), new_results.get(name))
+        for name in ("startup", "end_to_end", "peak_rss_bytes", 
+            "output_bytes")]
+
+    for name, old, new in rows:
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0
+        print("%-26s %10.3f %10.3f %+7.1f%%" % (name, old, new, change)
+            if isinstance(new, float) else
+            "%-26s %10d %10d %+7.1f%%" % (name, old, new, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("zip", help="zip to process, see benchmarks.generate")
+    parser.add_argument("--converter", default="fake",
+        help="converter for documents (default: fake, so only reistee "
+            "itself is measured)")
+    parser.add_argument("--dpi", type=int, default=reistee.image_dpi)
+    parser.add_argument("--memory-budget", type=int,
+        default=reistee.memory_budget,
+        help="MB above which students are merged page by page")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+        help="jobs for the end to end run (default: 1)")
+    parser.add_argument("--output",
+        help="json file for the results (default: "
+            "benchmarks/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", metavar="OLD_JSON",
+        help="results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    reistee.converter_backend = args.converter
+    reistee.image_dpi = args.dpi
+    reistee.memory_budget = args.memory_budget
+    reistee.cache_folder = ""
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "archive": os.path.basename(args.zip),
+        "archive_bytes": os.path.getsize(args.zip),
+        "settings": {"converter": args.converter, "dpi": args.dpi,
+            "jobs": args.jobs, "memory_budget": args.memory_budget},
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="reistee-bench-")
+
+    results["startup"] = startup_time()
+
+    try:
+        results["stages"] = run_stages(args.zip, work_dir)
+
+        # without cost model, so the timings of the benchmark (e.g. with
+        # the fake converter) don't change the estimates of real runs
+        start = time.perf_counter()
+        reistee.process_archive(args.zip, os.path.join(work_dir, "e2e"),
+            reistee.Options(jobs=args.jobs, rebuild=True, cost_model=""))
+        results["end_to_end"] = time.perf_counter() - start
+
+        results["output_files"], results["output_bytes"] = folder_size(
+            os.path.join(work_dir, "e2e"))
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results["peak_rss_bytes"], results["peak_rss_children_bytes"] = (
+        peak_rss())
+
+    output = args.output or os.path.join(os.path.dirname(
+        os.path.abspath(__file__)), "results", datetime.datetime.now()
+        .strftime("%Y%m%d-%H%M%S") + "-" + commit + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with open(output, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=1)
+
+    for stage, seconds in results["stages"].items():
+        print("%-26s %8.3f s" % (stage, seconds))
+    print("%-26s %8.3f s" % ("startup", results["startup"]))
+    print("%-26s %8.3f s" % ("end_to_end", results["end_to_end"]))
+    if results["peak_rss_bytes"] is not None:
+        print("%-26s %8.1f MB" % ("peak_rss",
+            results["peak_rss_bytes"] / 1024 / 1024))
+    print("%-26s %8.1f MB" % ("output",
+        results["output_bytes"] / 1024 / 1024))
+    print("Results saved to " + output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as old_file:
+            compare(json.load(old_file), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,225 @@
 import sys              # to work with command-line arguments
 import zipfile          # to extract zips
 import os               # various uses: navigation, deletion, paths 
+import pathlib          # for building file uris and paths in reports
 import shutil           # mainly for moving and deleting files
 import subprocess       # for running libreoffice in background
 import functools        # used for rotating images by metadata
-from fpdf import FPDF               # for creating pdf from images
-from PIL import Image               # for opening images
-from PyPDF2 import PdfFileMerger    # for merging pdfs
+import argparse         # for parsing command-line options
+import tempfile         # for separate libreoffice profiles
+import traceback        # for reporting errors from worker processes
+import multiprocessing  # needed for freezing the exe with worker processes
+import concurrent.futures   # for processing students in parallel
+import multiprocessing.util # for shutting down converters of workers
+import json             # for talking to the libreoffice bridge script
+import queue            # for waiting on libreoffice with a timeout
+import signal           # for killing hanging libreoffice instances
+import socket           # for finding a free port for libreoffice
+import threading        # for reading replies from libreoffice
+import io               # for keeping pdfs in memory
+import zlib             # for compressing images in pdfs
+import hashlib          # for finding converted files in the cache
+import time             # for profiling
+import contextlib       # for profiling
+import re               # for sorting files by the numbers in their names
+import glob             # for finding zips by patterns like *.zip
+import collections      # for converting pictures in order
+import mmap             # for reading large pdfs without loading them
+import tarfile          # for unpacking archives students uploaded
+import copy             # for changing options without changing the caller's
+
+# fpdf (for text files and placeholder pdfs), PIL (for pictures) and 
+# PyPDF2 (for merging pdfs) take long to import, so they are imported 
+# only where they are needed, which makes the exe start faster
 
 libreoffice_timeout = 20
+libreoffice_startup_timeout = 60
+
+# Which converter is used for documents, see create_converter
+converter_backend = "auto"
+
+# Document converter of this process, see get_converter
+converter = None
+
+# Number of documents each process converts at the same time, every one
+# with its own LibreOffice, see ConversionScheduler
+conversion_slots = 1
+
+# How often a conversion is tried again after LibreOffice hung or 
+# crashed, and the pause before the first retry in seconds, which is 
+# doubled for every further retry
+conversion_retries = 1
+conversion_retry_delay = 1.0
+
+# Quality of jpeg images in the generated pdfs
+jpeg_quality = 75
+
+# Resolution of pictures in the generated pdfs. Pictures are scaled to
+# fit on an A4 page and downsampled to this resolution. 0 keeps the full
+# resolution with one point per pixel.
+image_dpi = 0
+
+# Whether pictures are stored in grayscale
+grayscale_images = False
+
+# Whether photos of worksheets are cleaned up like a scanner would (see
+# scan_picture): "" leaves them as they are, "gray" crops them and 
+# evens out the lighting, "bw" also turns them into black and white
+scan_mode = ""
+
+# Folder of the conversion cache, empty turns the cache off. See 
+# ConversionCache for details.
+cache_folder = ""
+cache_size = 1024       # in MB
+
+# Conversion cache of this process, see get_cache
+cache = None
+
+# Changing this invalidates all entries of the conversion cache
+CACHE_VERSION = "1"
+
+# Whether the steps of a run are recorded, see Profiler
+profiling = False
+
+# Profiler of this process, None if not profiling
+profiler = None
+
+# Steps that work on a single file, see print_profile_report
+PER_FILE_STEPS = ("picture_to_page", "convert_doc", "text_to_page", 
+    "heic_to_jpg", 
+    "libreoffice", "soffice", "magick")
+
+# Students whose files are larger than this (in MB) are merged page by
+# page with StreamingPdfWriter, 0 for always merging in memory
+memory_budget = 256
+
+# Whether files a student uploaded several times are all put into the 
+# pdf, see skip_duplicates
+keep_duplicates = False
+
+# Archives students uploaded are unpacked and their files put into the
+# pdf like all other files (see expand_archive), up to this many MB and
+# files in all archives of a student and archives this deep inside each
+# other, so one huge or malicious upload can't stall the run or fill 
+# the disk. A depth of 0 turns unpacking off.
+archive_max_bytes = 256
+archive_max_members = 1000
+archive_max_depth = 3
+
+# Whether the combined pdfs are optimized, see optimize_pdf
+optimize_pdfs = False
+
+# Whether merge_categories returns the combined pdfs, so the worker 
+# processes send them to the main process for the results zip and the 
+# class pdf (see OutputSinks). Set by Options.worker_settings only.
+return_pdfs = False
+
+# Sizes of the pdfs before and after optimizing and the time it took 
+# since the last call of collect_stats
+optimize_stats = {"optimize_bytes_in": 0, "optimize_bytes_out": 0, 
+    "optimize_seconds": 0}
+
+# Seconds that converting the pictures, documents and text files of the
+# students took since the last call of collect_stats, for improving the
+# estimates of plan_students
+timing_stats = {"picture_seconds": 0, "doc_seconds": 0, 
+    "text_seconds": 0}
+
+# Number of pictures each process converts at the same time, see 
+# pic_to_pdf
+picture_threads = 1
+
+# Whether Pillow can open heic images, None if not checked yet, see
+# heic_supported
+heic_opener = None
+
+# Index of the file list for every kind of file. Pictures are converted
+# by pic_to_pdf, pdfs are taken as they are and docs are converted by 
+# doc_to_pdf, see merge_files_per_category
+PICTURES, PDFS, DOCS = 0, 1, 2
+
+# File endings reistee recognizes and the file list they belong into
+FILE_TYPES = {
+    ".jpg": PICTURES, ".jpeg": PICTURES, ".png": PICTURES, 
+    ".heic": PICTURES,
+    ".pdf": PDFS,
+    ".doc": DOCS, ".docx": DOCS, ".odt": DOCS, ".txt": DOCS, 
+    ".odp": DOCS, ".pptx": DOCS, ".ppt": DOCS, ".ppsx": DOCS,
+    ".ods": DOCS, ".xlsx": DOCS, ".xls": DOCS,
+}
+
+# File endings of archives that are unpacked, see expand_archive. 7z 
+# needs the optional package py7zr.
+ARCHIVE_ENDINGS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
+    ".tar.xz", ".txz", ".7z")
+
+# First bytes of files with a missing or unknown ending: offset, bytes
+# and the file ending they stand for, see sniff_file_type
+MAGIC_NUMBERS = [
+    (0, b"%PDF-", ".pdf"),
+    (0, b"\xff\xd8\xff", ".jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", ".png"),
+    (4, b"ftypheic", ".heic"), (4, b"ftypheix", ".heic"),
+    (4, b"ftypmif1", ".heic"), (4, b"ftyphevc", ".heic"),
+    # doc, xls and ppt of old MS Office versions
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", ".doc"),
+]
+
+# Estimated cost of the files of a student, for starting the students
+# that take longest first: seconds per file and MB per second for every
+# kind of file. "merge" is everything else (categorizing, reading pdfs,
+# merging), estimated from all files of the student. Scaled by what 
+# earlier runs measured, see load_cost_model
+COST_RATES = {"picture": (0.05, 4.0), "doc": (1.5, 1.0), 
+    "text": (0.01, 2.0), "merge": (0.01, 50.0)}
+
+# Size of an A4 page in points
+A4_WIDTH = 595.28
+A4_HEIGHT = 841.89
+
+# Documents reistee converts itself instead of with LibreOffice, see 
+# text_to_page
+TEXT_ENDINGS = (".txt",)
+
+# Characters that are common in texts but missing in the fonts of 
+# FPDF, which only know latin-1, and what is written instead
+TEXT_REPLACEMENTS = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201a": ",", "\u201c": '"', 
+    "\u201d": '"', "\u201e": '"', "\u2013": "-", "\u2014": "-", 
+    "\u2026": "...", "\u20ac": "EUR", "\u2022": "\xb7", "\ufeff": None,
+    "\u00a0": " ", "\t": "    "})
+
+# External programs: environment variable that overrides where the 
+# program is, names of the program in PATH and the usual places it is
+# installed to (patterns like for glob), see find_program
+PROGRAMS = {
+    "soffice": ("REISTEE_SOFFICE", ["soffice"], [
+        "%ProgramFiles%\\LibreOffice\\program\\soffice.exe",
+        "%ProgramFiles(x86)%\\LibreOffice\\program\\soffice.exe",
+        "C:\\Program Files\\LibreOffice\\program\\soffice.exe",
+        "C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe",
+        "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+        "/usr/lib/libreoffice/program/soffice",
+        "/usr/lib64/libreoffice/program/soffice",
+        "/opt/libreoffice*/program/soffice",
+        "/snap/bin/libreoffice"]),
+    "magick": ("REISTEE_MAGICK", ["magick"], [
+        "%ProgramFiles%\\ImageMagick*\\magick.exe",
+        "C:\\Program Files\\ImageMagick*\\magick.exe",
+        "/opt/homebrew/bin/magick", "/usr/local/bin/magick"]),
+    "qpdf": ("REISTEE_QPDF", ["qpdf"], [
+        "%ProgramFiles%\\qpdf*\\bin\\qpdf.exe",
+        "C:\\Program Files\\qpdf*\\bin\\qpdf.exe",
+        "/opt/homebrew/bin/qpdf", "/usr/local/bin/qpdf"]),
+}
+
+# Settings that are passed on to worker processes
+WORKER_SETTINGS = ("libreoffice_timeout", "libreoffice_startup_timeout",
+    "converter_backend", "jpeg_quality", "image_dpi", "grayscale_images",
+    "cache_folder", "cache_size", "profiling", "conversion_slots", 
+    "conversion_retries", "conversion_retry_delay", "picture_threads",
+    "memory_budget", "optimize_pdfs", "keep_duplicates", "scan_mode",
+    "archive_max_bytes", "archive_max_members", "archive_max_depth")
 
 def syscmd(cmd, encoding=''):
     """
@@ -31,35 +242,233 @@ def syscmd(cmd, encoding=''):
     return p.returncode
 
  
-def kill_by_process_name(name):
-    """
-    Attempts to kill a windows task via taskkill command. 
+class Profiler:
+    '''
+    Records how long the steps of reistee take, for finding out where 
+    the time of a run goes (see --profile). Every recorded step is an 
+    event in the Chrome trace format, with the wall time, the file or 
+    student it worked on and, where known, bytes read and written and 
+    the number of pages. Steps that run inside another step are 
+    recorded as well, so e.g. the time LibreOffice needs shows up 
+    inside doc_to_pdf.
+    '''
+
+    def __init__(self):
+        self.events = []
+        self.local = threading.local()
+
+
+    @contextlib.contextmanager
+    def span(self, name, args):
+        '''
+        Context manager that records the code inside of it as one event.
+
+        Parameters
+        ----------
+        name: Name of the step
+
+        args: Dict with details of the step, e.g. the file
+        '''
+
+        stack = self.local.__dict__.setdefault("stack", [])
+        event = {"name": name, "ph": "X", "pid": os.getpid(), 
+            "tid": threading.get_ident(), "ts": time.time() * 1000000, 
+            "args": args}
+        stack.append(event)
+        start = time.perf_counter()
+
+        try:
+            yield event
+
+        finally:
+            event["dur"] = (time.perf_counter() - start) * 1000000
+            stack.pop()
+            self.events.append(event)
+
+
+    def note(self, values):
+        '''
+        Adds details to the step that is currently recorded.
+
+        Parameters
+        ----------
+        values: Dict with the details, e.g. bytes_out or pages
+        '''
+
+        stack = self.local.__dict__.get("stack")
+
+        if stack:
+            stack[-1]["args"].update(values)
+
+
+    def take_events(self):
+        '''
+        Returns the recorded events and forgets them.
+        '''
+
+        events = self.events
+        self.events = []
+
+        return events
+
+
+def traced(function):
+    '''
+    Decorator that records every call of function while profiling, 
+    named like the function. The file or folder the call works on is
+    taken from the first argument. Without profiling the function is 
+    just called.
 
     Parameters
     ----------
-    name: Name of the task to kill (e.g. cmd.exe)
-    """
-    syscmd("taskkill /f /im " + name)
+    function: Function to record
+    '''
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+
+        if profiler is None:
+            return function(*args, **kwargs)
+
+        target = ""
+        if len(args) > 0 and isinstance(args[0], (str, ZipMember)):
+            target = os.path.basename(str(args[0]))
+
+        with profiler.span(function.__name__, {"target": target}):
+            return function(*args, **kwargs)
+
+    return wrapper
+
 
+def trace_span(name, **args):
+    '''
+    Returns a context manager that records the code inside of it while
+    profiling, e.g. waiting for a subprocess. Does nothing without 
+    profiling.
+
+    Parameters
+    ----------
+    name: Name of the step
+
+    args: Details of the step, e.g. the file
+    '''
+
+    if profiler is None:
+        return contextlib.nullcontext()
+
+    return profiler.span(name, args)
+
+
+def trace_note(**values):
+    '''
+    Adds details like bytes_in, bytes_out or pages to the step that is 
+    currently recorded. Does nothing without profiling.
+
+    Parameters
+    ----------
+    values: The details
+    '''
+
+    if profiler is not None:
+        profiler.note(values)
 
 
-def remove_unnecassary_symbols(dirpath, filename):
+def write_profile(path, events):
     '''
-    Removes "." "-" and "_" from filename and returns new filename
+    Writes the recorded events as json in the Chrome trace format, which
+    can be opened in chrome://tracing or https://ui.perfetto.dev.
 
     Parameters
     ----------
-    dirpath: Path of the directory that includes the file to rename
+    path: Path of the json file
+
+    events: Recorded events of all processes
+    '''
+
+    with open(path, "w", encoding="utf-8") as profile:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, 
+            profile)
+
+
+def print_profile_report(events, top=10):
+    '''
+    Prints the total time of every step, the slowest students and the
+    slowest single files.
+
+    Parameters
+    ----------
+    events: Recorded events of all processes
+
+    top: Number of students and files to print
+    '''
+
+    totals = {}
+
+    for event in events:
+        count, duration = totals.get(event["name"], (0, 0))
+        totals[event["name"]] = (count + 1, duration + event["dur"])
+
+    print("\nTime per step (steps inside other steps are included there):")
+    for name, (count, duration) in sorted(totals.items(), 
+            key=lambda total: -total[1][1]):
+        print("  %-26s %6d calls %10.2f s" % (name, count, 
+            duration / 1000000))
+
+    students = sorted((event for event in events 
+        if event["name"] == "student"), key=lambda event: -event["dur"])
+
+    print("\nSlowest students:")
+    for event in students[:top]:
+        print("  %10.2f s  %s" % (event["dur"] / 1000000, 
+            event["args"].get("target", "")))
 
-    filename: Filename of the file to rename
+    files = sorted((event for event in events if event["name"] in 
+        PER_FILE_STEPS), key=lambda event: -event["dur"])
 
+    print("\nSlowest files:")
+    for event in files[:top]:
+
+        # the student of a file is the one that was processed in the 
+        # same process at that time, every process works on one 
+        # student at a time
+        student = ""
+        for student_event in students:
+            if (student_event["pid"] == event["pid"] and 
+                    student_event["ts"] <= event["ts"] <= 
+                    student_event["ts"] + student_event["dur"]):
+                student = student_event["args"].get("target", "") + os.sep
+
+        details = ", ".join(name + " " + str(value) for name, value in 
+            sorted(event["args"].items()) if name != "target")
+        print("  %10.2f s  %-16s %s%s (%s)" % (event["dur"] / 1000000, 
+            event["name"], student, event["args"].get("target", ""), 
+            details))
+
+
+def natural_sort_key(filename):
+    '''
+    Returns the key files are sorted by, without renaming them. "." "-"
+    and "_" in front of the file ending are left out, because these 
+    symbols may screw up sorting of files, upper and lower case are 
+    treated the same and numbers are compared by their value, so 
+    "Seite 2.jpg" comes before "Seite 10.jpg".
+
+    Parameters
+    ----------
+    filename: Filename, may include a path. The symbols are only left 
+    out in the name of the file itself.
     '''
 
-    filename = shutil.move(dirpath + "\\" + filename, dirpath + "\\" +
-        (os.path.splitext(filename)[0]).replace(".","").replace("-","")
-        .replace("_","") + os.path.splitext(filename)[1])
+    dirpath, filename = os.path.split(filename)
+    name, ext = os.path.splitext(filename)
+    name = name.replace(".","").replace("-","").replace("_","")
 
-    return os.path.basename(filename)
+    # every odd part is a number, so parts at the same position are 
+    # always of the same type
+    parts = re.split(r"([0-9]+)", os.path.join(dirpath, name + ext))
+
+    return [int(part) if number % 2 else part.casefold() 
+        for number, part in enumerate(parts)]
 
 
 def reverse_student_name(curr_student):
@@ -106,42 +515,46 @@ def move_file_to_folder(file_with_path, curr_student):
 
     '''
 
-    if not (os.path.isfile(file_with_path)):
+    # files inside a zip are copied out of the zip
+    in_zip = not isinstance(file_with_path, str)
+
+    if not in_zip and not (os.path.isfile(file_with_path)):
         return
     
 
-    folder_path = os.path.dirname(curr_student) + "\\"
-    filename = os.path.basename(file_with_path)
+    folder_path = os.path.dirname(curr_student) + os.sep
+    filename = os.path.basename(str(file_with_path))
     file_ext = os.path.splitext(filename)[1]
 
     folder_name_reversed = reverse_student_name(curr_student)
 
+    target = folder_path + folder_name_reversed + file_ext
 
-    if os.path.isfile(folder_path + folder_name_reversed + file_ext):
+    # don't overwrite files of the student that were moved before
+    file_counter = 1
 
-        file_counter = 1
+    while os.path.isfile(target):
 
-        while os.path.isfile(folder_path + folder_name_reversed + 
-                                str(file_counter) + file_ext):
+        target = (folder_path + folder_name_reversed + 
+            str(file_counter) + file_ext)
+        file_counter += 1
 
-            file_counter += 1
-            shutil.move(file_with_path, folder_path + 
-                folder_name_reversed + str(file_counter) + file_ext)
-
-        file_counter = 1
+    if in_zip:
+        with file_with_path.open() as source, open(target, "wb") as dest:
+            shutil.copyfileobj(source, dest)
 
     else:
-        shutil.move(file_with_path, folder_path + 
-            folder_name_reversed + file_ext)
+        shutil.move(file_with_path, target)
 
 
 
 
+@traced
 def categorise_file(dirpath, filename, file_lists):
     '''
     Categorise a given file into the correct file list. Currently 
-    supportet are pictures, pdfs, docs, and txts. Returns false if
-    file format is not recognized.
+    supportet are pictures, pdfs, docs, and txts (see file_category). 
+    Returns false if file format is not recognized.
 
     Parameters
     ----------
@@ -155,43 +568,92 @@ def categorise_file(dirpath, filename, file_lists):
     '''
 
 
-    picture_files, pdf_files, doc_files = file_lists
-    file_to_conv_path = dirpath + "\\" + filename
+    file_to_conv_path = os.path.join(dirpath, filename)
 
     # Sort file into correct list. If file format is not recognized,
     # return false
     if not (os.path.isfile(file_to_conv_path)):
         return False
 
-    if (file_to_conv_path.endswith(".jpg") or 
-        file_to_conv_path.endswith(".jpeg") or 
-        file_to_conv_path.endswith(".png")):
+    category = file_category(filename, file_to_conv_path)
 
-        picture_files.append(file_to_conv_path)
-    
-    elif file_to_conv_path.endswith(".pdf"):
+    if category is None:
+        return False
+
+    file_lists[category].append(file_to_conv_path)
+        
+    return True
 
-        pdf_files.append(file_to_conv_path)
 
-    elif (file_to_conv_path.endswith(".doc") or 
-            file_to_conv_path.endswith(".docx") or 
-            file_to_conv_path.endswith(".odt") or 
-            file_to_conv_path.endswith(".txt") or 
-            file_to_conv_path.endswith(".odp") or 
-            file_to_conv_path.endswith(".pptx") or 
-            file_to_conv_path.endswith(".ppt") or 
-            file_to_conv_path.endswith(".ods") or
-            file_to_conv_path.endswith(".xlsx") or 
-            file_to_conv_path.endswith(".xls") or
-            file_to_conv_path.endswith(".ppsx")
-            ):
+def file_category(filename, file=None):
+    '''
+    Returns the index of the file list a file belongs into by its file 
+    ending (see FILE_TYPES), no matter if written in upper or lower 
+    case: 0 for pictures, 1 for pdfs and 2 for docs. Files with a 
+    missing or unknown ending are recognized by their content, if file
+    is given. Returns None if the file format is not recognized.
 
-        doc_files.append(file_to_conv_path)
+    Parameters
+    ----------
+    filename: Filename of the file that shall be categorized
+
+    file: Path or ZipMember of the file, for looking at its content
+    '''
+
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext not in FILE_TYPES and file is not None:
+        ext = sniff_file_type(file)
+
+    # without pillow-heif, heic images are converted into jpgs first
+    if ext == ".heic" and not heic_supported():
+        return None
+
+    return FILE_TYPES.get(ext)
+
+
+def sniff_file_type(file):
+    '''
+    Returns the file ending that fits the content of a file, found by 
+    its first bytes (see MAGIC_NUMBERS), or "" if the content is not 
+    recognized. Office documents of the same kind are not told apart, 
+    since LibreOffice finds that out itself.
+
+    Parameters
+    ----------
+    file: Path or ZipMember of the file
+    '''
+
+    try:
+        with open_file(file) as content:
+            head = content.read(128)
+
+    except (OSError, zipfile.BadZipFile):
+        return ""
+
+    for offset, magic, ext in MAGIC_NUMBERS:
+        if head[offset:offset + len(magic)] == magic:
+            return ext
+
+    # odt, docx and the like are zips, tell them apart from other zips
+    if head.startswith(b"PK\x03\x04"):
+        if head[30:58] == b"mimetypeapplication/vnd.oasi":
+            return ".odt"
+
+        try:
+            with open_file(file) as content:
+                with zipfile.ZipFile(content) as document:
+                    names = document.namelist()
+
+        except (OSError, zipfile.BadZipFile):
+            return ""
+
+        for name in names:
+            if name.split("/")[0] in ("word", "ppt", "xl"):
+                return ".docx"
+
+    return ""
 
-    else:
-        return False
-        
-    return True
 
 
 
@@ -217,6 +679,8 @@ def image_transpose_exif(im):
     The image to be rotated.
     """
 
+    from PIL import Image
+
     exif_orientation_tag = 0x0112
     exif_transpose_sequences = [                   # Val  0th row  0th col
         [],                                        #  0    (reserved)
@@ -238,425 +702,4904 @@ def image_transpose_exif(im):
         return functools.reduce(type(im).transpose, seq, im)
 
 
-def pic_to_pdf(pdf_filename, picture_files):
+class ConversionCache:
     '''
-    Converts a list of pictures into one pdf-File that gets stored in 
-    the directory given in pdf_filename. Generated pdfs contain _img_
-    at the end of the filename for easier use elsewhere.
+    Cache on disk for converted files, so files that were converted in 
+    an earlier run (re-downloaded assignments, late submissions, the 
+    same worksheet handed in by many students) are not converted again.
+    Entries are found by the hash of the content of the source file and
+    the settings of the conversion. When the cache grows larger than 
+    max_size, the entries that were used least recently are removed.
+    Several processes can use the same cache folder at the same time.
 
     Parameters
     ----------
-    pdf_filename: Filename of combined pdf with all pictures. "_img_" 
-    will be added to it.
+    cache_folder: Folder in which the converted files are stored
 
-    picture_files: List of Paths to pictures that shall be 
-    combined into pdf.
+    max_size: Maximum size of the cache in bytes
     '''
 
-    img_pdf_counter = 0
-    pdf_list = []
+    def __init__(self, cache_folder, max_size):
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.size = None
+        self.hits = 0
+        self.misses = 0
 
-    # create one pdf for every image, for scaling reasons 
-    # with different sized images
-    for picture_file in picture_files:
 
-        # Open picture and rotate if stated in pictures metadata
+    def key(self, file, settings):
+        '''
+        Returns the key of the converted file in the cache.
+
+        Parameters
+        ----------
+        file: Path or ZipMember of the source file
+
+        settings: String with everything else the result of the 
+        conversion depends on
+        '''
+
+        return hash_file(file, CACHE_VERSION + settings)
+
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_folder, key[:2], key)
+
+
+    def lookup(self, key):
+        '''
+        Returns the converted file stored under key as bytes, or None 
+        if it is not in the cache.
+
+        Parameters
+        ----------
+        key: Key of the converted file, see key
+        '''
+
+        entry = self.entry_path(key)
+
         try:
-            cover = Image.open(str(picture_file))
-            cover_transposed = image_transpose_exif(cover)
-            cover_transposed.save(str(picture_file))
-            width, height = cover_transposed.size
+            with open(entry, "rb") as cached:
+                data = cached.read()
 
-            # create temporary pdf, with _imgpdf_ in filename
-            pdf = FPDF(unit = "pt", format = [width, height])
-            pdf.add_page()
-            pdf.image(str(picture_file), 0, 0)
+            # last use is stored as modification time
+            os.utime(entry)
 
-            img_pdf_counter += 1
+        # not in cache, or removed by another process meanwhile
+        except OSError:
+            self.misses += 1
+            return None
 
-            pdf.output(pdf_filename + "_imgpdf_" + 
-                str(img_pdf_counter) + ".pdf", "F")
+        self.hits += 1
+        return data
 
-            pdf_list.append(pdf_filename + "_imgpdf_" + 
-                str(img_pdf_counter) + ".pdf")
 
+    def store(self, key, data):
+        '''
+        Stores a converted file in the cache and removes old entries if
+        the cache is too large.
 
-        except Image.UnidentifiedImageError:
-            print("Can't open image: " + 
-                os.path.basename(pdf_filename) + 
-                "\\" + os.path.basename(picture_file) + " : " +
-                "May be damaged or not correctly converted.")
-            move_file_to_folder(picture_file, pdf_filename)
+        Parameters
+        ----------
+        key: Key of the converted file, see key
 
+        data: Converted file as bytes
+        '''
 
-    # merge all _imgpdf_ files
-    if len(pdf_list) > 0:
-        img_merger = PdfFileMerger(strict=False)
-        for pdf in pdf_list:
-            img_merger.append(pdf)
-        img_merger.write(pdf_filename + "_img_" + ".pdf")
-        img_merger.close()
+        if len(data) > self.max_size:
+            return
 
-    # remove all _imgpdf_ Files
-    for pdf in pdf_list:
-        os.remove(pdf)
+        entry = self.entry_path(key)
 
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
 
-def check_libreoffice_install():
+            # write to a temporary file first, so other processes never
+            # read half written entries
+            handle, temp_entry = tempfile.mkstemp(
+                dir=os.path.dirname(entry), suffix=".tmp")
+            with os.fdopen(handle, "wb") as temp:
+                temp.write(data)
+            os.replace(temp_entry, entry)
+
+        except OSError:
+            return
+
+        if self.size is None:
+            self.size = self.scan_size()
+        else:
+            self.size += len(data)
+
+        if self.size > self.max_size:
+            self.evict()
+
+
+    def entries(self):
+        '''
+        Returns a list of tuples of last use, size and path of all 
+        entries in the cache.
+        '''
+
+        entries = []
+
+        for dirpath, dirnames, filenames in os.walk(self.cache_folder):
+            for filename in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, 
+                    os.path.join(dirpath, filename)))
+
+        return entries
+
+
+    def scan_size(self):
+        return sum(size for last_use, size, path in self.entries())
+
+
+    def evict(self):
+        '''
+        Removes the least recently used entries, until the cache is 
+        at most 80% of max_size, so it doesn't have to be cleaned up 
+        again after the next conversion.
+        '''
+
+        entries = sorted(self.entries())
+        self.size = sum(size for last_use, size, path in entries)
+
+        for last_use, size, path in entries:
+            if self.size <= self.max_size * 0.8:
+                break
+
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                pass
+
+
+    def take_stats(self):
+        '''
+        Returns hits and misses since the last call as dict.
+        '''
+
+        stats = {"cache_hits": self.hits, "cache_misses": self.misses}
+        self.hits = 0
+        self.misses = 0
+
+        return stats
+
+
+def default_cache_folder():
     '''
-    Checks, if LibreOffice is installed in the default
-    directories or if it is listed in the path environmental
-    variable. If not, returns an empty string
+    Returns the default folder of the conversion cache, in the local 
+    application data on windows and in ~/.cache on other systems.
     '''
 
-    libreoffice_x64_path = (
-        "C:\\Program Files\\LibreOffice\\program\\soffice.exe")
-    
-    # I hope that's true
-    libreoffice_x86_path = (
-        "C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe")
+    if os.name == "nt" and os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "reistee", "cache")
 
-    libreoffice_path = ""
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or
+        os.path.join(os.path.expanduser("~"), ".cache"), "reistee")
 
 
-    if(os.path.isfile(libreoffice_x86_path)):
+def get_cache():
+    '''
+    Returns the conversion cache of this process, or None if caching is
+    turned off (cache_folder is empty).
+    '''
 
-        libreoffice_path = libreoffice_x86_path
+    global cache
 
-    elif(os.path.isfile(libreoffice_x64_path)):
-        libreoffice_path = libreoffice_x64_path
+    if cache is None and cache_folder:
+        cache = ConversionCache(cache_folder, cache_size * 1024 * 1024)
 
-    elif(os.environ.get('Path').count("libreoffice\\program") > 0):
+    return cache
 
-        libreoffice_path = "soffice"
-    
 
-    return libreoffice_path
+def hash_file(file, salt=""):
+    '''
+    Returns the sha256 hash of the content of a file as hex string. The
+    file is read in chunks, so large files don't have to fit in memory.
 
+    Parameters
+    ----------
+    file: Path or ZipMember of the file
 
-def check_imagemagick_install():
-    '''
-    Checks, if ImageMagick is listed in the path environmental
-    variable. If not, returns False.
+    salt: String that is hashed in front of the content
     '''
 
-    if(os.environ.get('Path').count("ImageMagick") > 0):
+    digest = hashlib.sha256(salt.encode("utf-8"))
 
-        return True
-    
-    return False
-    
+    with open_file(file) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
 
+    return digest.hexdigest()
 
-def doc_to_pdf(pdf_filename, doc_files):
+
+def convert_cached(file, settings, convert):
     '''
-    Converts a list of odt, doc and docx Files into one pdf-File that 
-    gets stored in the directory given in pdf_filename. Generated pdfs 
-    contain _docs_ at the end of the filename for easier use elsewhere.
-    A working installation of Libreoffice is requiered for running this
-    method, and soffice.exe should be in PATH.
+    Returns the converted file from the cache, if it is in there. If
+    not, the file is converted by calling convert and the result is 
+    stored in the cache. Returns the converted file as bytes, or None
+    if it could not be converted.
 
     Parameters
     ----------
-    pdf_filename: Filename of combined pdf with all pictures. "_docs_" 
-    will be added to it.
+    file: Path or ZipMember of the source file
+
+    settings: String with everything else the result of the conversion
+    depends on
 
-    doc_files: List of Paths to .odt, .doc or .docx Files that shall be 
-    combined into pdf.
+    convert: Function without arguments that converts the file and 
+    returns the result as bytes, or None if that fails
     '''
 
-    base_dir = os.getcwd()
-    doc_counter = 1
-    converted_docs = []
+    conversion_cache = get_cache()
 
-    # navigate to every file and call libreoffice in that directory
-    # one pdf for every file will be generated by libreoffice
-    for doc_file in doc_files:   
+    if conversion_cache is None:
+        return convert()
 
-        os.chdir(os.getcwd() + "\\" + os.path.dirname(doc_file))
+    key = conversion_cache.key(file, settings)
+    data = conversion_cache.lookup(key)
 
+    if data is None:
+        data = convert()
 
-        if not check_libreoffice_install() == "":
+        if data is not None:
+            conversion_cache.store(key, data)
 
-            libreoffice = subprocess.Popen(check_libreoffice_install() +
-                " --nolockcheck --convert-to "+ str(doc_counter) + 
-                "py.pdf "+ "\"" + os.path.basename(doc_file)+ "\"")
+    return data
 
-            try:
-                test = libreoffice.wait(libreoffice_timeout)
-                converted_docs.append(os.path.dirname(doc_file) + "\\" + 
-                os.path.splitext(os.path.basename(doc_file))[0] + "." + 
-                str(doc_counter) + "py.pdf")
-                doc_counter += 1
-
-            except subprocess.TimeoutExpired as timeout:
-                libreoffice.terminate()
-                kill_by_process_name("soffice.com")
-                kill_by_process_name("soffice.bin")
-                kill_by_process_name("soffice.exe")
-                os.chdir(base_dir)
-                move_file_to_folder(doc_file, pdf_filename)
-                print("Konvertierung hat Zeitlimit überschritten. "+
-                "Datei wurde unkonvertiert kopiert.")
-        
 
-        # Should convert doc, docx and odt with MS Word. NOT TESTED! 
-        else:
-            new_name = (os.path.dirname(doc_file) + "\\" +
-                os.path.splitext(os.path.basename(doc_file))[0] + 
-                "." + str(doc_counter) + "py.pdf")
+@traced
+def pic_to_pdf(curr_student, picture_files, spool=False):
+    '''
+    Converts a list of pictures into one single-page pdf per picture,
+    for scaling reasons with different sized images. The pdfs are kept 
+    in memory, or in temporary files with spool, and returned as list 
+    of file-like objects. Up to picture_threads pictures are converted
+    at the same time, and only a few more are kept waiting, so memory
+    does not grow with the number of pictures. Pictures that can't be
+    opened are moved to the main folder.
 
-            try:
-                word = os.client.DispatchEx("Word.Application")
-                worddoc = word.Documents.Open(doc_file)
-                worddoc.SaveAs(new_name, FileFormat = 17)
-                converted_docs.append(new_name)
-                doc_counter += 1
-                worddoc.Close()
-                word.Quit()
+    Parameters
+    ----------
+    curr_student: Path of the student folder, used for naming 
+    pictures that are moved.
+
+    picture_files: List of paths or ZipMembers of the pictures.
+
+    spool: Whether the pdfs are written to temporary files, see 
+    page_buffer
+    '''
+
+    pages = []
+
+    settings = "picture %d %d %d %s" % (image_dpi, jpeg_quality, 
+        grayscale_images, scan_mode)
 
-            except Exception as e:
-                os.chdir(base_dir)
-                print("No Office installed. Please install LibreOffice!")
-                
-                move_file_to_folder(doc_file, pdf_filename)
+    threads = max(picture_threads, 1)
+    conversions = collections.deque()
 
-        os.chdir(base_dir)
+    def take_page():
+        picture_file, conversion = conversions.popleft()
 
+        try:
+            pages.append(page_buffer(conversion.result(), spool))
 
-    doc_counter = 1
+        except OSError:
+            print("Can't open image: " + 
+                os.path.basename(curr_student) + 
+                os.sep + os.path.basename(str(picture_file)) + " : " +
+                "May be damaged or not correctly converted.")
+            move_file_to_folder(picture_file, curr_student)
 
-    if not len(converted_docs) == 0:
-    # merge all created pdfs into one pdf
-        doc_merger = PdfFileMerger(strict=False)
-        for converted_doc in converted_docs:
-            doc_merger.append(converted_doc)
+    # Pillow releases the GIL while decoding, scaling and encoding, so 
+    # several pictures can be converted at the same time in threads
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for picture_file in picture_files:
+            conversions.append((picture_file, pool.submit(convert_cached, 
+                picture_file, settings, 
+                functools.partial(picture_to_page, picture_file))))
 
-        doc_merger.write(pdf_filename + "_docs_" + ".pdf")
-        doc_merger.close()            
+            if len(conversions) > 2 * threads:
+                take_page()
 
+        while conversions:
+            take_page()
 
+    return pages
 
-def iterate_and_categorize(curr_student):
 
+def page_buffer(data, spool=False):
     '''
-    Iterates recursivly through all files in student_folder and 
-    categorizes them into the correct file list. Returns a list 
-    of filled file-lists. Also removes unnecessary symbols in 
-    filenames that may screw up sorting of files.
+    Returns a file-like object with a converted pdf. With spool, the 
+    pdf is written to a temporary file, which is removed when it is
+    closed, so it does not take up memory.
 
     Parameters
     ----------
-    curr_student: Path to a student folder. All files in this folder
-    and all subfolders will be categorized.
+    data: The pdf as bytes
+
+    spool: Whether the pdf is written to a temporary file
     '''
 
-    picture_files = []
-    pdf_files = []
-    doc_files = []
-    file_lists = (picture_files, pdf_files, doc_files)
-    
+    if not spool:
+        return io.BytesIO(data)
 
-    for dirpath, dirnames, filenames in os.walk(curr_student):
+    buffer = tempfile.TemporaryFile(prefix="reistee-")
+    buffer.write(data)
+    buffer.seek(0)
+
+    return buffer
 
-        for filename in filenames:
 
-            filename = remove_unnecassary_symbols(dirpath, filename)
+def flatten_picture(im):
+    '''
+    Returns the image in a mode that can be stored in a pdf, either 
+    RGB or grayscale. Transparent areas become white.
 
-            if filename.endswith(".heic"):
+    Parameters
+    ----------
+    im: PIL.Image
+    The image to convert.
+    '''
 
-                if check_imagemagick_install():
-                    full_filename = dirpath + "\\" + filename
-                    im = subprocess.Popen(["magick", "%s" % full_filename,
-                        "%s" % (full_filename[0:-5] + '.jpg')])
-                    response = im.wait()
-                    new_filename = filename.replace(".heic",".jpg")
-                    filename = new_filename
+    from PIL import Image
 
-                else:
-                    print(".heic Image found, but no ImageMagick installed."+
-                        " Please install from https://imagemagick.org/")
+    if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info:
+        im = im.convert("RGBA")
+        background = Image.new("RGB", im.size, "white")
+        background.paste(im, mask=im.getchannel("A"))
+        return background
 
-            
-            if not categorise_file(dirpath, filename, file_lists):
-                move_file_to_folder(dirpath + "\\" + filename, curr_student)
-    
-    return file_lists
+    if im.mode not in ("RGB", "L"):
+        return im.convert("L" if im.mode in ("1", "I", "I;16") else "RGB")
 
+    return im
 
 
-def merge_files_per_category(curr_student, categorized_files):
+def picture_page_size(size):
     '''
-    Checks if files of a format for specific student exist and sorts the 
-    list alphabetically. Then it either passses the job to create a 
-    merged pdf for all files of a specific format to another method or 
-    does it itself, if doing it is short and easy enough. When done, 
-    there should be one or many pdf files in the main dir for each student,
-    named filename_format_.pdf
+    Returns the size of the page for a picture in points. With full 
+    resolution (image_dpi is 0) that is one point per pixel, otherwise
+    the picture is scaled to fit on an A4 page, turned to landscape for
+    landscape pictures.
 
     Parameters
     ----------
-    curr_student: Path to the folder of the current student.
-
-    categorized_files: List of file-lists that each store the files of
-    the correct format
+    size: Width and height of the picture in pixels
     '''
 
-    picture_files, pdf_files, doc_files = categorized_files
+    if not image_dpi:
+        return size
 
-    # First sort list and then generate pdf from its elements, either
-    # by calling a method or doing it here.
-    if len(picture_files) != 0 :
+    width, height = size
 
-        picture_files.sort()
+    if width > height:
+        page_width, page_height = A4_HEIGHT, A4_WIDTH
+    else:
+        page_width, page_height = A4_WIDTH, A4_HEIGHT
 
-        pic_to_pdf(curr_student, picture_files)
+    scale = min(page_width / width, page_height / height)
 
-    if len(pdf_files) != 0 :
+    return (width * scale, height * scale)
 
-        pdf_files.sort()
 
-        pdf_merger = PdfFileMerger(strict=False)
-        for pdf in pdf_files:
-            pdf_merger.append(pdf)
+def downsampled_size(size):
+    '''
+    Returns the size in pixels a picture should have for its page at 
+    image_dpi. Pictures are never upsampled.
 
-        pdf_merger.write(curr_student + "_pdfs_" + ".pdf")
-        pdf_merger.close()
+    Parameters
+    ----------
+    size: Width and height of the picture in pixels
+    '''
 
-    if len(doc_files) != 0:
+    page_width, page_height = picture_page_size(size)
 
-        doc_files.sort()
+    if not image_dpi:
+        return size
 
-        doc_to_pdf(curr_student, doc_files)
-    
+    width = round(page_width * image_dpi / 72)
+    height = round(page_height * image_dpi / 72)
 
+    if width >= size[0] or height >= size[1]:
+        return size
 
+    return (max(width, 1), max(height, 1))
 
-def merge_categories(curr_student):
+
+def image_to_pdf_page(im, use_jpeg, page_size=None):
     '''
-    Merge all generated pdf files for different file formats
-    into one combined pdf file. Name of that pdf file should 
-    be reversed folder name, because student folders are named 
-    "firstname lastname" and generated pdf should be named 
-    "lastname, fistname"
+    Creates a pdf with a single page that shows the image. Returns the 
+    pdf as bytes, so no file has to be written. Jpeg images are stored
+    as jpeg, black and white images (mode "1") with fax compression 
+    (see ccitt_data) and all others losslessly with zip compression. 
+    Transparent areas become white.
 
     Parameters
     ----------
-    curr_student: Path to folder of student, whose pdfs will
-    be merged. Folder wont be used, only path is necessary
-    for naming pdf.
+    im: PIL.Image
+    The image to put on the page.
+
+    use_jpeg: Whether the image is stored as jpeg.
+
+    page_size: Width and height of the page in points. By default one 
+    point per pixel, like the pages FPDF creates.
     '''
 
-    student_name_reversed = reverse_student_name(curr_student)
+    if im.mode != "1":
+        im = flatten_picture(im)
 
+    width, height = im.size
+    bits = 8
+    decode_parms = b""
 
-    fullmerger = PdfFileMerger(strict=False)
+    if page_size is None:
+        page_size = im.size
 
-    at_least_one_file = False
+    if im.mode == "1":
+        bits = 1
+        image_data = ccitt_data(im)
 
-    # add existing merged file format specific pdfs to merger
-    if os.path.isfile(curr_student + "_pdfs_" + ".pdf"):
+        if image_data is None:
+            image_data = zlib.compress(im.tobytes())
+            image_filter = "/FlateDecode"
 
-        fullmerger.append(curr_student + "_pdfs_" + ".pdf")
-        at_least_one_file = True
+        else:
+            image_filter = "/CCITTFaxDecode"
 
-    if os.path.isfile(curr_student + "_img_" + ".pdf"):
+            # white pixels are 1 bits in Pillow, which the fax 
+            # compression calls black, so they have to become 1 bits
+            # again when decoding
+            decode_parms = (b"/DecodeParms << /K -1 /Columns %d /Rows %d "
+                b"/BlackIs1 true >> " % (width, height))
 
-        fullmerger.append(curr_student + "_img_" + ".pdf")
-        at_least_one_file = True
+    elif use_jpeg:
+        image_data = io.BytesIO()
+        im.save(image_data, "JPEG", quality=jpeg_quality)
+        image_data = image_data.getvalue()
+        image_filter = "/DCTDecode"
 
-    if os.path.isfile(curr_student + "_docs_" + ".pdf"):
+    else:
+        image_data = zlib.compress(im.tobytes())
+        image_filter = "/FlateDecode"
 
-        fullmerger.append(curr_student + "_docs_" + ".pdf")
-        at_least_one_file = True
+    if im.mode in ("L", "1"):
+        color_space = "/DeviceGray"
+    else:
+        color_space = "/DeviceRGB"
+
+    content = b"q %.2f 0 0 %.2f 0 0 cm /I0 Do Q" % page_size
+
+    pdf_objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] " 
+            b"/Resources << /XObject << /I0 4 0 R >> >> /Contents 5 0 R >>"
+            % page_size,
+        b"<< /Type /XObject /Subtype /Image /Width %d /Height %d " 
+            b"/ColorSpace %s /BitsPerComponent %d /Filter %s %s"
+            b"/Length %d >>\nstream\n" % (width, height, 
+            color_space.encode(), bits, image_filter.encode(), 
+            decode_parms, len(image_data)) + 
+            image_data + b"\nendstream",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + 
+            b"\nendstream",
+    ]
 
-    
-    if at_least_one_file:
-        # merge pdfs and create pdf with reversed name
-        fullmerger.write(os.path.dirname(curr_student) + "\\" + 
-            student_name_reversed  + ".pdf")
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
 
+    for number, pdf_object in enumerate(pdf_objects, 1):
+        offsets.append(pdf.tell())
+        pdf.write(b"%d 0 obj\n" % number + pdf_object + b"\nendobj\n")
 
-    fullmerger.close()
+    xref_offset = pdf.tell()
+    pdf.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
 
-    
-    # delete merged file format specific pdfs
-    if os.path.isfile(curr_student + "_pdfs_" + ".pdf"):
-        os.remove(curr_student + "_pdfs_" + ".pdf")
+    for offset in offsets:
+        pdf.write(b"%010d 00000 n \n" % offset)
 
-    if os.path.isfile(curr_student + "_img_" + ".pdf"):
-        os.remove(curr_student + "_img_" + ".pdf")
-    
-    if os.path.isfile(curr_student + "_docs_" + ".pdf"):
-        os.remove(curr_student + "_docs_" + ".pdf")
+    pdf.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(offsets) + 1, xref_offset))
 
+    return pdf.getvalue()
 
 
-def create_merged_pdfs(dir_name):
+def ccitt_data(im):
     '''
-    Iterates through all student folders and calls the methods
-    to categorize the files of a stundent, create a pdf for each 
-    category and then merge the pdf of each category into one 
-    combined pdf for that stundent. The combined pdf will not be 
-    placed in the student dir, but in the main dir, since stundent
-    dirs will be deleted.
+    Returns a black and white image compressed like faxes (CCITT group 
+    4), which is usually much smaller than zip compression for written
+    pages. Returns None if Pillow was built without libtiff, which does
+    the compression.
 
     Parameters
     ----------
-    dir_name: Main dir, into which the merged pdfs will be placed.
-    Must contain subfolders for each student.
+    im: PIL.Image
+    The image in mode "1".
     '''
 
-    # List of student dirs
-    student_folders = [f.path for f in os.scandir(dir_name) if f.is_dir()]
+    from PIL import Image, features
 
+    if not features.check("libtiff"):
+        return None
 
-    for student_folder in student_folders:
+    # the whole image has to be in one strip of the tiff
+    tiff = io.BytesIO()
+    im.save(tiff, "TIFF", compression="group4", tiffinfo={278: im.height})
+    tiff = tiff.getvalue()
 
-        categorized_files = iterate_and_categorize(student_folder)
+    with Image.open(io.BytesIO(tiff)) as compressed:
+        offset = compressed.tag_v2[273][0]
+        length = compressed.tag_v2[279][0]
 
-        merge_files_per_category(student_folder, categorized_files)
+    return tiff[offset:offset + length]
 
-        merge_categories(student_folder)
 
-        # Remove student dir (cleanup)
-        try:
-            shutil.rmtree(student_folder)
+@traced
+def picture_to_page(picture_file):
+    '''
+    Opens a picture, rotates it if stated in its metadata and returns
+    a pdf with one page showing the picture as bytes. The
+    picture is downsampled to image_dpi and converted to grayscale if 
+    set, before it is put into the pdf. The picture itself is not 
+    changed.
 
-        except PermissionError as permission:
-            print("Einige Daten konnten nicht gelöscht werden, da " + 
-            "möglicherweise ein anderer Prozess auf sie zugreift. Dies "+
-            "kann durch beschädigte Dateien entstehen.")
+    Parameters
+    ----------
+    picture_file: Path to the picture or ZipMember
+    '''
 
+    from PIL import Image
 
-if __name__ == "__main__":
-    '''
-    Reistee Extracts IServ - Teachers Easy Extractor
-    Autor: Marc Franke
-    Version: 0.00.787.49
-    
-    With reistee you can easily extract student solution zips
-    downloaded from IServ.
-    '''
+    with open_file(picture_file) as picture:
+        im = Image.open(picture)
 
-    # Get name of folder or zip passed as command line argument
-    main_name_w_ext = os.path.basename(sys.argv[1])
-    main_name_wo_ext, main_ext = os.path.splitext(main_name_w_ext)
+        # heic images are photos, so jpeg keeps the pdf small
+        use_jpeg = im.format in ("JPEG", "HEIF")
+
+        # Jpegs can be decoded at a fraction of their size, which is 
+        # much faster than decoding everything and downsampling later
+        im.draft(im.mode, downsampled_size(im.size))
+        im.load()
+
+    im = flatten_picture(image_transpose_exif(im))
+
+    # only photos are scanned, screenshots are clean already
+    scan = scan_mode and use_jpeg
+    if scan:
+        im = scan_picture(im)
+
+    if grayscale_images:
+        im = im.convert("L")
+
+    page_size = picture_page_size(im.size)
+    pixel_size = downsampled_size(im.size)
+
+    if pixel_size != im.size:
+        im = im.resize(pixel_size, Image.LANCZOS)
+
+    # thresholding the downsampled picture keeps thin lines
+    if scan and scan_mode == "bw":
+        im = threshold_picture(im)
 
-    # If zip is passed, extract it
-    if(sys.argv[1].endswith(".zip")):
+    page = image_to_pdf_page(im, use_jpeg, page_size)
+    trace_note(bytes_in=file_size(picture_file), bytes_out=len(page), 
+        pages=1)
 
-        extract_dir_name = main_name_wo_ext + " - reistee"
-        with zipfile.ZipFile(sys.argv[1], 'r') as zip_ref:
-            zip_ref.extractall(extract_dir_name)
+    return page
 
 
-    # If folder is passed, copy contents
-    if os.path.isdir(sys.argv[1]):
+def scan_picture(im):
+    '''
+    Makes a photo of a worksheet look like a scan: the background 
+    around the paper is cropped and the uneven lighting of the photo 
+    (shadows, yellow lamps) is evened out, so the paper becomes white
+    and the writing dark. Returns a grayscale image. Works on the whole
+    picture at once with numpy, which has to be installed.
+
+    Parameters
+    ----------
+    im: PIL.Image
+    The photo, in RGB or grayscale.
+    '''
+
+    import numpy
+    from PIL import Image, ImageFilter
+
+    gray = numpy.asarray(im.convert("L"), dtype=numpy.float32)
+    gray = crop_to_paper(gray)
+
+    # the paper is the brightest part of every area of the photo, large
+    # blocks make sure writing is never taken for paper
+    block = max(max(gray.shape) // 40, 8)
+    paper = Image.fromarray(block_reduce(gray, block, numpy.max))
+    paper = paper.filter(ImageFilter.MaxFilter(3))
+    paper = upsample(numpy.asarray(paper), gray.shape)
+
+    gray /= numpy.maximum(paper, 1)
+
+    # everything near the brightness of the paper becomes white and the
+    # darkest writing black
+    black = min(numpy.percentile(gray[::4, ::4], 0.5), 0.6)
+    gray -= black
+    gray *= 255 / (0.92 - black)
+
+    return Image.fromarray(numpy.clip(gray, 0, 255).astype(numpy.uint8))
+
+
+def crop_to_paper(gray):
+    '''
+    Returns the part of a grayscale photo that shows the paper, found as
+    the rows and columns that are mostly brighter than the threshold of
+    Otsu, i.e. lighter than the table or floor around the paper. If the
+    paper fills the photo or can't be found, the photo is returned as 
+    it is.
+
+    Parameters
+    ----------
+    gray: numpy array of the photo
+    '''
+
+    import numpy
+
+    # a sample is enough for finding the edges of the paper
+    step = max(min(gray.shape) // 400, 1)
+    sample = gray[::step, ::step]
+
+    bright = sample > otsu_threshold(sample)
+    rows = numpy.flatnonzero(bright.mean(axis=1) > 0.5)
+    columns = numpy.flatnonzero(bright.mean(axis=0) > 0.5)
+
+    if len(rows) == 0 or len(columns) == 0:
+        return gray
+
+    top, bottom = rows[0] * step, (rows[-1] + 1) * step
+    left, right = columns[0] * step, (columns[-1] + 1) * step
+
+    # not a sheet of paper on a darker background
+    if (bottom - top) * (right - left) < gray.size * 0.3:
+        return gray
+
+    # leave out the shadow at the edge of the paper
+    margin = min(gray.shape) // 100
+    top, left = top + margin, left + margin
+    bottom, right = bottom - margin, right - margin
+
+    if bottom <= top or right <= left:
+        return gray
+
+    return gray[top:bottom, left:right]
+
+
+def otsu_threshold(gray):
+    '''
+    Returns the brightness that separates the dark and the bright part
+    of a grayscale image best (Otsu's method).
+
+    Parameters
+    ----------
+    gray: numpy array of the image, values from 0 to 255
+    '''
+
+    import numpy
+
+    histogram = numpy.bincount(gray.astype(numpy.uint8).ravel(), 
+        minlength=256).astype(numpy.float64)
+    levels = numpy.arange(256)
+
+    # pixels and sum of brightness up to every threshold
+    weight = numpy.cumsum(histogram)
+    total = numpy.cumsum(histogram * levels)
+    dark_mean = total / numpy.maximum(weight, 1)
+    bright_mean = ((total[-1] - total) / 
+        numpy.maximum(weight[-1] - weight, 1))
+
+    between = weight * (weight[-1] - weight) * (dark_mean - bright_mean) ** 2
+
+    return int(numpy.argmax(between))
+
+
+def threshold_picture(im):
+    '''
+    Turns a picture from scan_picture into black and white: a pixel is 
+    black if it is clearly darker than its surroundings (adaptive 
+    threshold after Bradley), so faint pencil on white paper is kept 
+    while the grain of the paper becomes white. Returns an image with 
+    one bit per pixel.
+
+    Parameters
+    ----------
+    im: PIL.Image
+    The picture in grayscale.
+    '''
+
+    import numpy
+    from PIL import Image
+
+    gray = numpy.asarray(im, dtype=numpy.float32)
+
+    block = max(max(gray.shape) // 60, 4)
+    surroundings = upsample(block_reduce(gray, block, numpy.mean), 
+        gray.shape)
+
+    white = (gray > surroundings * 0.85) | (gray > 200)
+
+    return Image.fromarray(white)
+
+
+def block_reduce(array, block, reducer):
+    '''
+    Returns a smaller array, with every value computed by reducer from 
+    a block of block x block values of array, e.g. their maximum. The 
+    edges are repeated to fill incomplete blocks.
+
+    Parameters
+    ----------
+    array: 2-dimensional numpy array
+
+    block: Size of the blocks
+
+    reducer: numpy function that takes an axis argument, e.g. numpy.max
+    '''
+
+    import numpy
+
+    height, width = array.shape
+    array = numpy.pad(array, ((0, -height % block), (0, -width % block)), 
+        mode="edge")
+
+    return reducer(array.reshape(array.shape[0] // block, block, 
+        array.shape[1] // block, block), axis=(1, 3)).astype(numpy.float32)
+
+
+def upsample(array, shape):
+    '''
+    Returns array scaled up to shape with bilinear interpolation, so 
+    there are no visible edges between the blocks of block_reduce.
+
+    Parameters
+    ----------
+    array: 2-dimensional numpy array
+
+    shape: Height and width of the result
+    '''
+
+    import numpy
+    from PIL import Image
+
+    image = Image.fromarray(array.astype(numpy.float32))
+
+    return numpy.asarray(image.resize((shape[1], shape[0]), 
+        Image.BILINEAR))
+
+
+@functools.lru_cache(maxsize=None)
+def find_program(name):
+    '''
+    Searches for an external program reistee uses (see PROGRAMS) and
+    returns the path of its executable, or an empty string if it is not
+    installed. The environment variable of the program wins, then PATH
+    is searched, then the folders the installers usually put it in. 
+    Every program is only searched for once per process.
+
+    Parameters
+    ----------
+    name: Name of the program in PROGRAMS, e.g. "soffice"
+    '''
+
+    env_variable, commands, locations = PROGRAMS[name]
+
+    override = os.environ.get(env_variable, "")
+    if override:
+        if os.path.isfile(override):
+            return override
+
+        print(env_variable + " is set, but " + override + " does not " +
+            "exist. Searching for " + name + " elsewhere.")
+
+    for command in commands:
+        path = shutil.which(command)
+        if path:
+            return path
+
+    for location in locations:
+        location = os.path.expandvars(location)
+
+        # newest version first, e.g. of C:\Program Files\ImageMagick-*
+        for path in sorted(glob.glob(location), reverse=True):
+            if os.path.isfile(path):
+                return path
+
+    return ""
+
+
+def check_libreoffice_install():
+    '''
+    Checks, if LibreOffice is installed in the default directories, if 
+    it is in PATH or if REISTEE_SOFFICE points to it (see find_program).
+    Returns the path of soffice, or an empty string if it isn't found.
+    '''
+
+    return find_program("soffice")
+
+
+def check_imagemagick_install():
+    '''
+    Checks, if ImageMagick is installed in the default directories, if 
+    it is in PATH or if REISTEE_MAGICK points to it (see find_program).
+    If not, returns False.
+    '''
+
+    return find_program("magick") != ""
+
+
+# Script for a python interpreter that can import uno (usually the one
+# that comes with LibreOffice). It connects to a running LibreOffice and
+# converts the documents it reads from stdin, one json job per line. The
+# result of every job is written to stdout as json as well.
+UNO_BRIDGE_SCRIPT = r'''
+import sys
+import json
+import time
+import uno
+from com.sun.star.beans import PropertyValue
+
+def prop(name, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+context = uno.getComponentContext()
+resolver = context.ServiceManager.createInstanceWithContext(
+    "com.sun.star.bridge.UnoUrlResolver", context)
+deadline = time.time() + float(sys.argv[2])
+while True:
+    try:
+        remote = resolver.resolve("uno:socket,host=127.0.0.1,port=" +
+            sys.argv[1] + ";urp;StarOffice.ComponentContext")
+        break
+    except Exception:
+        if time.time() > deadline:
+            sys.exit(1)
+        time.sleep(0.2)
+
+desktop = remote.ServiceManager.createInstanceWithContext(
+    "com.sun.star.frame.Desktop", remote)
+export_filters = [
+    ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+    ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+    ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export")]
+print(json.dumps({"ok": True}), flush=True)
+
+for line in sys.stdin:
+    job = json.loads(line)
+    if job.get("quit"):
+        try:
+            desktop.terminate()
+        except Exception:
+            pass
+        break
+    try:
+        doc = desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(job["src"]), "_blank", 0,
+            (prop("Hidden", True), prop("ReadOnly", True)))
+        if doc is None:
+            raise RuntimeError("document could not be loaded")
+        try:
+            export_filter = "writer_pdf_Export"
+            for service, name in export_filters:
+                if doc.supportsService(service):
+                    export_filter = name
+            doc.storeToURL(uno.systemPathToFileUrl(job["dst"]),
+                (prop("FilterName", export_filter),))
+        finally:
+            doc.close(True)
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    print(json.dumps(result), flush=True)
+'''
+
+
+def find_free_port():
+    '''
+    Returns a tcp port on localhost that is currently not in use.
+    '''
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_group_args():
+    '''
+    Returns the keyword arguments for subprocess.Popen that start a 
+    process in its own process group, so it can be killed together 
+    with its children by kill_process_tree.
+    '''
+
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process):
+    '''
+    Kills a process started by reistee together with all processes it
+    started itself, e.g. soffice.bin started by soffice.exe. Other 
+    processes, like an Office window the user has open, are not touched.
+    The process must have been started in its own process group on 
+    systems other than windows.
+
+    Parameters
+    ----------
+    process: subprocess.Popen object of the process to kill
+    '''
+
+    if process.poll() is not None:
+        return
+
+    if os.name == "nt":
+        syscmd("taskkill /f /t /pid " + str(process.pid))
+
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            process.kill()
+
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+def find_uno_python(soffice_path):
+    '''
+    Searches for a python interpreter that can import uno, which is 
+    needed to talk to a running LibreOffice. LibreOffice on windows 
+    ships its own python in its program folder, on linux the system
+    python usually has uno installed. Returns an empty string if no 
+    such interpreter is found.
+
+    Parameters
+    ----------
+    soffice_path: Path to the soffice executable
+    '''
+
+    program_dir = os.path.dirname(os.path.realpath(
+        shutil.which(soffice_path) or soffice_path))
+
+    candidates = [os.path.join(program_dir, "python.exe"),
+        os.path.join(program_dir, "python"), "/usr/bin/python3"]
+
+    # a frozen exe can't be used as python interpreter
+    if not getattr(sys, "frozen", False):
+        candidates.insert(0, sys.executable)
+
+    for candidate in candidates:
+        if not os.path.isfile(candidate):
+            continue
+
+        try:
+            check = subprocess.run([candidate, "-c", "import uno"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+
+        if check.returncode == 0:
+            return candidate
+
+    return ""
+
+
+class ConverterFailure(Exception):
+    '''
+    Raised by a converter if converting a document failed because the 
+    converter itself hung or crashed, not because of the document. The
+    converter has already killed its processes, so the conversion can
+    be tried again (see ConversionScheduler).
+    '''
+
+
+class LibreOfficeConverter:
+    '''
+    Converts documents with a LibreOffice instance that is started once
+    and then used for all documents of a run, instead of starting 
+    LibreOffice for every single document. The documents are passed to
+    LibreOffice over its UNO socket interface by a small bridge script 
+    (see UNO_BRIDGE_SCRIPT). Every instance uses its own profile, so 
+    several instances can run at the same time. If a conversion takes 
+    longer than libreoffice_timeout, the instance is killed and started
+    again for the next document and ConverterFailure is raised.
+
+    Parameters
+    ----------
+    soffice_path: Path to the soffice executable
+
+    python_path: Path to a python interpreter that can import uno
+    '''
+
+    def __init__(self, soffice_path, python_path):
+        self.soffice_path = soffice_path
+        self.python_path = python_path
+        self.office = None
+        self.bridge = None
+        self.replies = None
+        self.profile_dir = ""
+
+
+    def start(self):
+        '''
+        Starts LibreOffice and the bridge script and waits until 
+        LibreOffice accepts documents. Returns False if LibreOffice 
+        could not be started.
+        '''
+
+        self.profile_dir = tempfile.mkdtemp(prefix="reistee-lo-")
+        port = str(find_free_port())
+
+        # own process group, so the whole instance can be killed later
+        group_args = process_group_args()
+
+        self.office = subprocess.Popen([self.soffice_path, "--headless",
+            "--invisible", "--nologo", "--norestore", "--nolockcheck",
+            "-env:UserInstallation=" + 
+                pathlib.Path(self.profile_dir).as_uri(),
+            "--accept=socket,host=127.0.0.1,port=" + port + ";urp;"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            **group_args)
+
+        self.bridge = subprocess.Popen([self.python_path, "-c", 
+            UNO_BRIDGE_SCRIPT, port, str(libreoffice_startup_timeout)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, 
+            stderr=subprocess.DEVNULL, text=True, encoding="utf-8",
+            **group_args)
+
+        # replies are read by a thread, so waiting for them can time out
+        self.replies = queue.Queue()
+        threading.Thread(target=self.read_replies, 
+            args=(self.bridge.stdout, self.replies), daemon=True).start()
+
+        if self.wait_for_reply(libreoffice_startup_timeout) is None:
+            print("LibreOffice could not be started.")
+            self.close()
+            return False
+
+        return True
+
+
+    @staticmethod
+    def read_replies(stream, replies):
+        '''
+        Puts every line the bridge script writes into the replies queue.
+        None is put into the queue when the bridge script exits.
+
+        Parameters
+        ----------
+        stream: stdout of the bridge script
+
+        replies: queue.Queue for the replies
+        '''
+
+        for line in stream:
+            try:
+                replies.put(json.loads(line))
+            except ValueError:
+                pass
+
+        replies.put(None)
+
+
+    def wait_for_reply(self, timeout):
+        '''
+        Waits for the next reply of the bridge script and returns it. 
+        Returns None if there is no reply within timeout seconds or the 
+        bridge script has exited.
+
+        Parameters
+        ----------
+        timeout: Seconds to wait for the reply
+        '''
+
+        try:
+            return self.replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+    def convert(self, doc_file, pdf_file):
+        '''
+        Converts one document into a pdf. Returns True if the pdf was 
+        created. Raises ConverterFailure if LibreOffice hangs or exits.
+
+        Parameters
+        ----------
+        doc_file: Path of the document to convert
+
+        pdf_file: Path of the pdf to create
+        '''
+
+        if self.bridge is None and not self.start():
+            return False
+
+        try:
+            self.bridge.stdin.write(json.dumps({"src": 
+                os.path.abspath(doc_file), 
+                "dst": os.path.abspath(pdf_file)}) + "\n")
+            self.bridge.stdin.flush()
+        except OSError:
+            self.close()
+            raise ConverterFailure("LibreOffice exited")
+
+        with trace_span("libreoffice", 
+                target=os.path.basename(doc_file)):
+            reply = self.wait_for_reply(libreoffice_timeout)
+
+        if reply is None:
+            # LibreOffice hangs or crashed, start a fresh instance for
+            # the next document
+            self.close()
+            raise ConverterFailure("timeout")
+
+        return reply.get("ok", False) and os.path.isfile(pdf_file)
+
+
+    def close(self):
+        '''
+        Shuts LibreOffice down and removes its profile. Instances that 
+        don't react are killed.
+        '''
+
+        if self.bridge is not None:
+            try:
+                self.bridge.stdin.write(json.dumps({"quit": True}) + "\n")
+                self.bridge.stdin.close()
+                self.bridge.wait(5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                pass
+
+            kill_process_tree(self.bridge)
+            self.bridge = None
+
+        if self.office is not None:
+            try:
+                self.office.wait(5)
+            except subprocess.TimeoutExpired:
+                pass
+
+            kill_process_tree(self.office)
+            self.office = None
+
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = ""
+
+
+class SofficeConverter:
+    '''
+    Converts documents by starting LibreOffice once for every document.
+    Only used if no python interpreter with uno is available, because
+    starting LibreOffice takes several seconds.
+
+    Parameters
+    ----------
+    soffice_path: Path to the soffice executable
+    '''
+
+    def __init__(self, soffice_path):
+        self.soffice_path = soffice_path
+        self.profile_dir = tempfile.mkdtemp(prefix="reistee-lo-")
+
+
+    def convert(self, doc_file, pdf_file):
+        '''
+        Converts one document into a pdf. Returns True if the pdf was 
+        created. Raises ConverterFailure if LibreOffice takes longer 
+        than libreoffice_timeout, after killing it.
+
+        Parameters
+        ----------
+        doc_file: Path of the document to convert
+
+        pdf_file: Path of the pdf to create
+        '''
+
+        out_dir = tempfile.mkdtemp(dir=self.profile_dir)
+
+        # own process group, so only this LibreOffice is killed on a 
+        # timeout and not other conversions or an Office window the 
+        # user has open
+        libreoffice = subprocess.Popen([self.soffice_path, "--headless",
+            "--nolockcheck", "-env:UserInstallation=" + 
+                pathlib.Path(self.profile_dir, "profile").as_uri(),
+            "--convert-to", "pdf", "--outdir", out_dir, 
+            os.path.abspath(doc_file)], **process_group_args())
+
+        try:
+            with trace_span("soffice", target=os.path.basename(doc_file)):
+                libreoffice.wait(libreoffice_timeout)
+
+        except subprocess.TimeoutExpired:
+            kill_process_tree(libreoffice)
+            raise ConverterFailure("timeout")
+
+        out_file = os.path.join(out_dir, os.path.splitext(
+            os.path.basename(doc_file))[0] + ".pdf")
+
+        if not os.path.isfile(out_file):
+            return False
+
+        shutil.move(out_file, pdf_file)
+        return True
+
+
+    def close(self):
+        '''
+        Removes the LibreOffice profile.
+        '''
+
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class WordConverter:
+    '''
+    Converts doc, docx and odt with MS Word, if no LibreOffice is 
+    installed. NOT TESTED!
+    '''
+
+    def convert(self, doc_file, pdf_file):
+        '''
+        Converts one document into a pdf. Returns True if the pdf was 
+        created.
+
+        Parameters
+        ----------
+        doc_file: Path of the document to convert
+
+        pdf_file: Path of the pdf to create
+        '''
+
+        try:
+            import win32com.client
+            word = win32com.client.DispatchEx("Word.Application")
+            worddoc = word.Documents.Open(os.path.abspath(doc_file))
+            worddoc.SaveAs(os.path.abspath(pdf_file), FileFormat = 17)
+            worddoc.Close()
+            word.Quit()
+
+        except Exception as e:
+            print("No Office installed. Please install LibreOffice!")
+            return False
+
+        return True
+
+
+    def close(self):
+        pass
+
+
+class FakeConverter:
+    '''
+    Creates a one page pdf with the name of the document instead of
+    converting it. Used for testing the pipeline on computers without
+    an Office installation.
+    '''
+
+    def convert(self, doc_file, pdf_file):
+        '''
+        Creates a pdf for one document. Always returns True.
+
+        Parameters
+        ----------
+        doc_file: Path of the document to "convert"
+
+        pdf_file: Path of the pdf to create
+        '''
+
+        from fpdf import FPDF
+
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        pdf.cell(0, 10, os.path.basename(doc_file).encode(
+            "latin-1", "replace").decode("latin-1"))
+        pdf.output(pdf_file, "F")
+
+        return True
+
+
+    def close(self):
+        pass
+
+
+def create_converter(backend):
+    '''
+    Creates the converter for documents. Returns None if no Office
+    can be found.
+
+    Parameters
+    ----------
+    backend: "auto" uses a running LibreOffice if possible, then 
+    LibreOffice started for every document, then MS Word. "libreoffice",
+    "soffice" and "word" force one of these, "fake" creates dummy pdfs.
+    '''
+
+    if backend == "fake":
+        return FakeConverter()
+
+    if backend == "word":
+        return WordConverter()
+
+    soffice_path = check_libreoffice_install()
+
+    if soffice_path == "":
+        if backend == "auto":
+            return WordConverter()
+        return None
+
+    if backend in ("auto", "libreoffice"):
+        python_path = find_uno_python(soffice_path)
+
+        if python_path:
+            return LibreOfficeConverter(soffice_path, python_path)
+
+    return SofficeConverter(soffice_path)
+
+
+class ConversionScheduler:
+    '''
+    Runs document conversions in threads, with up to slots conversions
+    at the same time. Every slot has its own converter (and therefore 
+    its own LibreOffice with its own profile), which is created when it
+    is needed for the first time. Each conversion is watched by its 
+    converter with its own timeout; a converter that hangs or crashes 
+    is killed by its process id without disturbing the others, and the
+    conversion is tried again after a growing pause (see 
+    conversion_retries and conversion_retry_delay).
+
+    Parameters
+    ----------
+    first_converter: Converter created by create_converter, used for 
+    the first slot
+
+    slots: Maximum number of conversions at the same time
+    '''
+
+    def __init__(self, first_converter, slots):
+        self.name = type(first_converter).__name__
+
+        # MS Word is controlled over COM, which must stay in one thread
+        if isinstance(first_converter, WordConverter):
+            slots = 1
+
+        self.slots = max(slots, 1)
+        self.converters = [first_converter]
+        self.idle = queue.Queue()
+        self.idle.put(first_converter)
+        self.lock = threading.Lock()
+        self.pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.slots, thread_name_prefix="reistee-convert")
+
+
+    def submit(self, function, *args):
+        '''
+        Runs function(*args) in one of the slots and returns a 
+        concurrent.futures.Future for its result. function should call
+        convert for the actual conversion.
+
+        Parameters
+        ----------
+        function: Function to run
+
+        args: Arguments of function
+        '''
+
+        return self.pool.submit(function, *args)
+
+
+    def acquire(self):
+        '''
+        Returns a converter that is not used by another conversion. A 
+        new converter is created if all are busy and there are free 
+        slots.
+        '''
+
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if len(self.converters) < self.slots:
+                new_converter = create_converter(converter_backend)
+
+                if new_converter is not None:
+                    self.converters.append(new_converter)
+                    return new_converter
+
+        return self.idle.get()
+
+
+    def convert(self, doc_file, pdf_file):
+        '''
+        Converts one document into a pdf with a free converter. Returns
+        True if the pdf was created, False if the document could not be
+        converted or the converter failed every time.
+
+        Parameters
+        ----------
+        doc_file: Path of the document to convert
+
+        pdf_file: Path of the pdf to create
+        '''
+
+        doc_converter = self.acquire()
+
+        try:
+            for attempt in range(conversion_retries + 1):
+                if attempt > 0:
+                    time.sleep(conversion_retry_delay * 2 ** (attempt - 1))
+
+                try:
+                    return doc_converter.convert(doc_file, pdf_file)
+
+                except ConverterFailure:
+                    pass
+
+        finally:
+            self.idle.put(doc_converter)
+
+        print("Konvertierung hat Zeitlimit überschritten. "+
+            "Datei wurde unkonvertiert kopiert.")
+        return False
+
+
+    def close(self):
+        '''
+        Waits for running conversions and shuts all converters down.
+        '''
+
+        self.pool.shutdown(wait=True)
+
+        for doc_converter in self.converters:
+            doc_converter.close()
+
+        self.converters = []
+
+
+def get_converter():
+    '''
+    Returns the document converter of this process, a 
+    ConversionScheduler. It is created when it is needed for the first
+    time and then used for all documents, so LibreOffice is searched 
+    for and started only once. Returns None if no Office can be found.
+    '''
+
+    global converter
+
+    if converter is None:
+        first_converter = create_converter(converter_backend)
+
+        if first_converter is not None:
+            converter = ConversionScheduler(first_converter, 
+                conversion_slots)
+
+    return converter
+
+
+def close_converter():
+    '''
+    Shuts the document converter of this process down, if there is one.
+    '''
+
+    global converter
+
+    if converter is not None:
+        converter.close()
+        converter = None
+
+
+@traced
+def doc_to_pdf(curr_student, doc_files, spool=False):
+    '''
+    Converts a list of odt, doc, docx and other office documents into
+    pdfs, which are returned as list of file-like objects. A working 
+    installation of Libreoffice is requiered for running this method,
+    except for text files, which are converted by reistee itself (see 
+    text_to_page) unless they contain characters its fonts don't have
+    (see text_fits_fonts). LibreOffice can only convert files, so documents 
+    inside a zip are written to a temporary folder first, which is 
+    removed afterwards, together with the pdfs LibreOffice creates. The
+    documents are converted at the same time, as far as the converter 
+    allows (see ConversionScheduler). Documents that can't be converted
+    are moved to the main folder.
+
+    Parameters
+    ----------
+    curr_student: Path of the student folder, used for naming 
+    documents that are moved.
+
+    doc_files: List of paths or ZipMembers of the documents.
+
+    spool: Whether the pdfs are written to temporary files, see 
+    page_buffer
+    '''
+
+    pages = []
+    doc_converter = None
+
+    # students who only handed in text files need no Office
+    office_docs = [doc_file for doc_file in doc_files 
+        if not is_text_file(doc_file) or not text_fits_fonts(doc_file)]
+
+    if len(office_docs) > 0:
+        doc_converter = get_converter()
+
+        if doc_converter is None:
+            print("No Office installed. Please install LibreOffice!")
+
+    with tempfile.TemporaryDirectory(prefix="reistee-") as work_dir:
+
+        # functions returning the pdf of every document, or None
+        conversions = []
+
+        for doc_counter, doc_file in enumerate(doc_files, 1):
+
+            # text files are converted while waiting for LibreOffice, 
+            # without Office also the ones text_to_page can't show fully
+            if is_text_file(doc_file) and (doc_converter is None or 
+                    doc_file not in office_docs):
+                conversions.append(functools.partial(convert_text, 
+                    doc_file))
+                continue
+
+            if doc_converter is None:
+                conversions.append(lambda: None)
+                continue
+
+            # LibreOffice chooses how to open a file by its file ending
+            settings = ("doc " + os.path.splitext(str(doc_file))[1] + 
+                " " + doc_converter.name)
+
+            conversions.append(doc_converter.submit(convert_cached, 
+                doc_file, settings, functools.partial(convert_doc, 
+                    doc_converter, doc_file, 
+                    os.path.join(work_dir, str(doc_counter)))).result)
+
+        # the pdfs keep the order of the documents
+        for doc_file, conversion in zip(doc_files, conversions):
+            converted_doc = conversion()
+
+            if converted_doc is None:
+                move_file_to_folder(doc_file, curr_student)
+            else:
+                pages.append(page_buffer(converted_doc, spool))
+
+    return pages
+
+
+@traced
+def convert_doc(doc_converter, doc_file, work_dir):
+    '''
+    Converts one document with the converter and returns the pdf as 
+    bytes, or None if the document could not be converted. Documents 
+    inside a zip are written to work_dir first.
+
+    Parameters
+    ----------
+    doc_converter: Converter to use, see ConversionScheduler
+
+    doc_file: Path or ZipMember of the document
+
+    work_dir: Folder for temporary files, which is created
+    '''
+
+    os.mkdir(work_dir)
+    doc_path = doc_file
+
+    if not isinstance(doc_file, str):
+        doc_path = os.path.join(work_dir, os.path.basename(doc_file.name))
+
+        with doc_file.open() as source, open(doc_path, "wb") as dest:
+            shutil.copyfileobj(source, dest)
+
+    converted_doc = os.path.join(work_dir, "converted.pdf")
+
+    if not doc_converter.convert(doc_path, converted_doc):
+        return None
+
+    trace_note(bytes_in=os.path.getsize(doc_path), 
+        bytes_out=os.path.getsize(converted_doc))
+
+    with open(converted_doc, "rb") as converted:
+        return converted.read()
+
+
+
+def convert_text(text_file):
+    '''
+    Converts a text file with text_to_page, or takes it from the cache,
+    and adds the time it took to timing_stats. Returns the pdf as bytes.
+
+    Parameters
+    ----------
+    text_file: Path or ZipMember of the text file
+    '''
+
+    start = time.perf_counter()
+
+    try:
+        return convert_cached(text_file, "text", 
+            functools.partial(text_to_page, text_file))
+
+    finally:
+        timing_stats["text_seconds"] += time.perf_counter() - start
+
+
+def is_text_file(doc_file):
+    '''
+    Returns whether a document is a plain text file, which is 
+    converted by text_to_page instead of LibreOffice.
+
+    Parameters
+    ----------
+    doc_file: Path or ZipMember of the document
+    '''
+
+    return os.path.splitext(str(doc_file))[1].lower() in TEXT_ENDINGS
+
+
+def text_content(data):
+    '''
+    Returns the text of a text file as text_to_page writes it: decoded
+    (see decode_text), with unix line endings and with the characters 
+    of TEXT_REPLACEMENTS replaced.
+
+    Parameters
+    ----------
+    data: Content of the text file as bytes
+    '''
+
+    return (decode_text(data).replace("\r\n", "\n").replace("\r", "\n")
+        .translate(TEXT_REPLACEMENTS))
+
+
+def text_fits_fonts(text_file):
+    '''
+    Returns whether all characters of a text file are in the fonts of 
+    text_to_page, which only know latin-1. Others, e.g. Turkish, Polish,
+    Cyrillic or Greek letters or maths symbols, are converted by the 
+    document converter like other documents.
+
+    Parameters
+    ----------
+    text_file: Path or ZipMember of the text file
+    '''
+
+    with open_file(text_file) as text:
+        content = text_content(text.read())
+
+    try:
+        content.encode("latin-1")
+        return True
+
+    except UnicodeEncodeError:
+        return False
+
+
+def decode_text(data):
+    '''
+    Returns the text of a text file as string. The encoding is taken 
+    from a byte order mark if there is one, otherwise utf-8 is tried, 
+    and if that fails the text is taken as windows encoding (cp1252), 
+    which is what Notepad wrote for a long time. 
+
+    Parameters
+    ----------
+    data: Content of the text file as bytes
+    '''
+
+    if data.startswith(b"\xef\xbb\xbf"):
+        return data[3:].decode("utf-8", "replace")
+
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return data.decode("utf-16", "replace")
+
+    try:
+        return data.decode("utf-8")
+
+    except UnicodeDecodeError:
+        return data.decode("cp1252", "replace")
+
+
+@traced
+def text_to_page(text_file):
+    '''
+    Converts a text file into a pdf with A4 pages and returns it as 
+    bytes, without LibreOffice and without writing any file. Long lines
+    are wrapped and the text goes on over as many pages as needed. The
+    encoding is detected by decode_text, so umlauts come out right no
+    matter if the file was written on Windows or elsewhere. Characters 
+    that are not in latin-1 (see text_fits_fonts) are written as "?", 
+    and a message tells which file is affected.
+
+    Parameters
+    ----------
+    text_file: Path or ZipMember of the text file
+    '''
+
+    from fpdf import FPDF
+
+    with open_file(text_file) as text:
+        data = text.read()
+
+    content = text_content(data)
+
+    # the fonts of FPDF only know latin-1
+    try:
+        content.encode("latin-1")
+
+    except UnicodeEncodeError:
+        print("Some characters of " + str(text_file) + " can't be " + 
+            "shown without LibreOffice and are replaced by \"?\".")
+        content = content.encode("latin-1", "replace").decode("latin-1")
+
+    pdf = FPDF(unit="pt", format=(A4_WIDTH, A4_HEIGHT))
+    pdf.set_margins(56, 56)
+    pdf.set_auto_page_break(True, 56)
+    pdf.add_page()
+    pdf.set_font("Courier", size=10)
+    pdf.multi_cell(0, 12, content)
+
+    page = pdf.output(dest="S").encode("latin-1")
+    trace_note(bytes_in=len(data), bytes_out=len(page), pages=pdf.page)
+
+    return page
+
+
+@traced
+def iterate_and_categorize(curr_student, archive_budget=None):
+
+    '''
+    Iterates recursivly through all files in student_folder and 
+    categorizes them into the correct file list. Returns a list 
+    of filled file-lists. Nothing is written to disk, files are not
+    renamed for sorting (see natural_sort_key).
+
+    Parameters
+    ----------
+    curr_student: Path to a student folder. All files in this folder
+    and all subfolders will be categorized.
+
+    archive_budget: Budget for unpacking the archives of the student 
+    (see new_archive_budget). Pass one and close its archives with 
+    close_archives when the files are merged, otherwise they stay open
+    until they are garbage collected.
+    '''
+
+    picture_files = []
+    pdf_files = []
+    doc_files = []
+    file_lists = (picture_files, pdf_files, doc_files)
+
+    if archive_budget is None:
+        archive_budget = new_archive_budget()
+    
+
+    for dirpath, dirnames, filenames in os.walk(curr_student):
+
+        for filename in filenames:
+
+            # archives are unpacked and their files categorized here
+            if archive_ending(filename):
+                archive = os.path.join(dirpath, filename)
+                members = expand_archive(archive, archive_budget)
+
+                if members != [archive]:
+                    for member in members:
+                        if not categorize_member(member, file_lists):
+                            move_file_to_folder(member, curr_student)
+                    continue
+
+            # without pillow-heif, heic images are converted into jpgs 
+            # with ImageMagick first, which are kept in memory
+            if filename.lower().endswith(".heic") and not heic_supported():
+
+                full_filename = os.path.join(dirpath, filename)
+                jpg = convert_cached(full_filename, "heic", 
+                    lambda: heic_to_jpg(full_filename))
+
+                if jpg is not None:
+                    picture_files.append(ZipMember(None, 
+                        full_filename[0:-5] + ".jpg", jpg))
+                    continue
+
+            
+            if not categorise_file(dirpath, filename, file_lists):
+                move_file_to_folder(os.path.join(dirpath, filename), 
+                    curr_student)
+    
+    skip_duplicates(curr_student, file_lists)
+
+    return file_lists
+
+
+def skip_duplicates(curr_student, file_lists):
+    '''
+    Sorts the file-lists and removes files with the same content as a 
+    file before them, e.g. a photo a student uploaded twice, unless 
+    keep_duplicates is set. Only files of the same size are compared 
+    by their hash, so most files are not read at all. Skipped files are
+    printed.
+
+    Parameters
+    ----------
+    curr_student: Path of the student folder, for printing skipped 
+    files
+
+    file_lists: List of file-lists, which are changed
+    '''
+
+    for file_list in file_lists:
+        file_list.sort(key=lambda f: natural_sort_key(str(f)))
+
+    if keep_duplicates:
+        return
+
+    for file_list in file_lists:
+        sizes = collections.Counter(file_size(file) for file in file_list)
+        first_files = {}
+        unique_files = []
+
+        for file in file_list:
+            if sizes[file_size(file)] > 1:
+                file_hash = hash_file(file)
+
+                if file_hash in first_files:
+                    print("Skipped duplicate: " + 
+                        os.path.basename(curr_student) + os.sep + 
+                        os.path.relpath(str(file), str(curr_student)) + 
+                        " (same as " + os.path.basename(str(
+                            first_files[file_hash])) + ")")
+                    continue
+
+                first_files[file_hash] = file
+
+            unique_files.append(file)
+
+        file_list[:] = unique_files
+
+
+
+@traced
+def merge_files_per_category(curr_student, categorized_files):
+    '''
+    Converts the files of every format of a student into pdfs, in the
+    order of the file-lists (see skip_duplicates), by calling a method 
+    or doing it here, if doing it is short and easy enough. Returns a 
+    list of all pdfs in the order they appear in the combined pdf: pdfs
+    first, then pictures, then docs. Nothing is written to disk, unless
+    the files of the student are larger than memory_budget: then the 
+    pdfs of the student are left where they are and returned as paths or
+    ZipMembers, and converted pictures and docs are written to 
+    temporary files, so merge_categories can merge them without 
+    loading everything into memory.
+
+    Parameters
+    ----------
+    curr_student: Path to the folder of the current student.
+
+    categorized_files: List of file-lists that each store the files of
+    the correct format, sorted by skip_duplicates
+    '''
+
+    # the file-lists are already sorted by skip_duplicates
+    picture_files, pdf_files, doc_files = categorized_files
+
+    input_size = sum(file_size(file) for file_list in categorized_files
+        for file in file_list)
+    spool = memory_budget > 0 and input_size > memory_budget * 1024 * 1024
+
+    page_sources = []
+
+    for pdf_file in pdf_files:
+        if spool:
+            page_sources.append(pdf_file)
+        else:
+            with open_file(pdf_file) as pdf:
+                page_sources.append(io.BytesIO(pdf.read()))
+
+    if len(picture_files) != 0 :
+        start = time.perf_counter()
+
+        page_sources += pic_to_pdf(curr_student, picture_files, spool)
+
+        timing_stats["picture_seconds"] += time.perf_counter() - start
+
+    if len(doc_files) != 0:
+        start = time.perf_counter()
+        text_seconds = timing_stats["text_seconds"]
+
+        page_sources += doc_to_pdf(curr_student, doc_files, spool)
+
+        # text files are timed by doc_to_pdf itself
+        timing_stats["doc_seconds"] += (time.perf_counter() - start - 
+            (timing_stats["text_seconds"] - text_seconds))
+
+    return page_sources
+
+
+
+@traced
+def merge_categories(curr_student, page_sources):
+    '''
+    Merge the pdfs of all file formats into one combined pdf file, 
+    which is written in one go. Name of that pdf file should 
+    be reversed folder name, because student folders are named 
+    "firstname lastname" and generated pdf should be named 
+    "lastname, fistname". Nothing is written if there are no pdfs.
+    If not all pdfs are in memory (see merge_files_per_category) or 
+    optimize_pdfs is set, the pdf is written page by page with 
+    StreamingPdfWriter instead, and optimized (see optimize_pdf).
+    With return_pdfs, the content of the pdf is returned, otherwise 
+    None.
+
+    Parameters
+    ----------
+    curr_student: Path to folder of student, whose pdfs will
+    be merged. Folder wont be used, only path is necessary
+    for naming pdf.
+
+    page_sources: List of pdfs as file-like objects, paths or 
+    ZipMembers, in the order they shall appear in the combined pdf 
+    (see merge_files_per_category).
+    '''
+
+    if len(page_sources) == 0:
+        return None
+
+    merged_pdf = os.path.join(os.path.dirname(curr_student),
+        reverse_student_name(curr_student) + ".pdf")
+
+    if optimize_pdfs:
+        optimize_pdf(merged_pdf, page_sources)
+        return read_returned_pdf(merged_pdf)
+
+    if not all(isinstance(page_source, io.BytesIO) 
+            for page_source in page_sources):
+        with StreamingPdfWriter(merged_pdf) as writer:
+            for page_source in page_sources:
+                writer.append(page_source)
+
+        trace_note(pages=writer.page_count, 
+            bytes_out=os.path.getsize(merged_pdf))
+        return read_returned_pdf(merged_pdf)
+
+    from PyPDF2 import PdfFileMerger
+
+    merger = PdfFileMerger(strict=False)
+
+    for page_source in page_sources:
+        merger.append(page_source)
+
+    # the pdf is in memory anyway, so it is not read again for returning
+    data = io.BytesIO()
+    merger.write(data)
+    trace_note(pages=len(merger.pages), bytes_out=len(data.getbuffer()))
+    merger.close()
+
+    with open(merged_pdf, "wb") as merged_file:
+        merged_file.write(data.getbuffer())
+
+    if return_pdfs:
+        return data.getvalue()
+
+    return None
+
+
+def read_returned_pdf(merged_pdf):
+    '''
+    Returns the content of a combined pdf that was written page by page
+    if return_pdfs is set, otherwise None. It was just written, so it 
+    is read from the cache of the operating system.
+
+    Parameters
+    ----------
+    merged_pdf: Path of the combined pdf
+    '''
+
+    if not return_pdfs:
+        return None
+
+    with open(merged_pdf, "rb") as merged_file:
+        return merged_file.read()
+
+
+class StreamingPdfWriter:
+    '''
+    Writes a pdf from the pages of other pdfs, page by page, so memory 
+    does not grow with the size of the pdfs. Every object a page needs
+    (contents, fonts, images) is written as soon as the page is 
+    written, and objects read from the input are dropped afterwards. 
+    Objects shared by several pages of the same input are only written
+    once. Inputs on disk are memory-mapped instead of read, and every 
+    input is closed as soon as its pages are written. Bookmarks and
+    forms of the inputs are not copied, but every input can get a 
+    bookmark of its own, e.g. with the name of the student in the class
+    pdf (see OutputSinks).
+
+    With optimize, identical objects are written only once, even if 
+    they come from different inputs, e.g. the fonts LibreOffice embeds
+    in every document or the contents and images of a worksheet 
+    several students uploaded. Pages and their annotations are never 
+    merged (see number). For this, the objects an object refers to are
+    written before it, so their numbers are known and the object can be
+    compared by its bytes. Streams that are not compressed are 
+    compressed.
+
+    The pdf is written to a temporary file next to path (see 
+    partial_output_path), which replaces path when the pdf is closed. 
+    If writing fails, it is removed (see discard), so there is never a 
+    half written pdf under path.
+
+    Parameters
+    ----------
+    path: Path of the pdf to write
+
+    optimize: Whether identical objects are merged and streams 
+    compressed
+    '''
+
+    def __init__(self, path, optimize=False):
+        self.path = path
+        self.temp_path = partial_output_path(path)
+        self.output = open(self.temp_path, "wb")
+        self.output.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        self.optimize = optimize
+
+        # object 1 is the catalog and 2 the page tree, both are 
+        # written at the end
+        self.offsets = [None, None, None]
+        self.pages = []
+        self.page_count = 0
+
+        # title and page numbers of the inputs that get a bookmark
+        self.outlines = []
+
+        # numbers of the objects written so far by their hash and the
+        # objects of the current input that are being written, for
+        # optimize
+        self.hashes = {}
+        self.copying = set()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+    def append(self, page_source, outline=None):
+        '''
+        Writes all pages of a pdf. The pdf is closed afterwards.
+
+        Parameters
+        ----------
+        page_source: Path, ZipMember or file-like object of the pdf
+
+        outline: Title of a bookmark that points to the first page of 
+        the pdf, None for no bookmark
+        '''
+
+        from PyPDF2 import PdfReader
+
+        with open_mapped(page_source) as pdf:
+            reader = PdfReader(pdf, strict=False)
+
+            if reader.is_encrypted:
+                reader.decrypt("")
+
+            # new object numbers of the objects of this input
+            self.numbers = {}
+            self.waiting = []
+
+            # pages get their numbers first, so links between pages
+            # point to the copied page. They are not queued, every page
+            # is written once below, after the one before it is done.
+            page_numbers = []
+
+            for page in reader.pages:
+                page_number = self.new_number()
+                self.numbers[(page.indirect_ref.idnum,
+                    page.indirect_ref.generation)] = page_number
+                page_numbers.append(page_number)
+
+            for page, page_number in zip(reader.pages, page_numbers):
+                self.write_object(page_number, page)
+
+                while self.waiting:
+                    self.write_object(*self.waiting.pop())
+
+                # everything the page needs is written, so nothing read
+                # from the input has to be kept
+                reader.resolved_objects.clear()
+
+            self.pages += page_numbers
+            self.page_count += len(page_numbers)
+
+            if outline is not None and len(page_numbers) > 0:
+                self.outlines.append((outline, page_numbers))
+
+
+    def sort_outlines(self):
+        '''
+        Puts the pdfs that got a bookmark in the order of their 
+        bookmarks (see natural_sort_key), no matter in which order they
+        were appended, e.g. students that finished in any order. Only 
+        the page tree written by close changes, so nothing has to be 
+        written again. Pdfs without bookmark stay in front.
+        '''
+
+        self.outlines.sort(key=lambda outline: natural_sort_key(
+            outline[0]))
+
+        outline_pages = set(page for title, page_numbers in self.outlines
+            for page in page_numbers)
+
+        self.pages = ([page for page in self.pages 
+            if page not in outline_pages] + [page for title, page_numbers
+            in self.outlines for page in page_numbers])
+
+
+    def number(self, reference, shared=True):
+        '''
+        Returns the object number in the output of an object of the 
+        current input. Objects that did not get a number yet are 
+        written later, or right away with optimize, so identical 
+        objects can get the same number.
+
+        Parameters
+        ----------
+        reference: PyPDF2 IndirectObject pointing to the object
+
+        shared: Whether the object may get the same number as an 
+        identical one with optimize. Pages and their annotations must 
+        not, every page has its own place in the page tree and notes 
+        written on one page must not show up on the other.
+        '''
+
+        from PyPDF2 import generic
+
+        key = (reference.idnum, reference.generation)
+
+        if key in self.numbers:
+            return self.numbers[key]
+
+        # objects that refer back to an object that is being written 
+        # can't be compared, it gets its number now and is written 
+        # when it is done
+        if key in self.copying:
+            self.numbers[key] = self.new_number()
+            return self.numbers[key]
+
+        # e.g. a link to a page that is not in the page tree
+        pdf_object = reference.get_object()
+        if (isinstance(pdf_object, generic.DictionaryObject) and 
+                pdf_object.get("/Type") == "/Page"):
+            shared = False
+
+        if not self.optimize or not shared:
+            self.numbers[key] = self.new_number()
+            self.waiting.append((self.numbers[key], reference))
+            return self.numbers[key]
+
+        self.copying.add(key)
+        data = io.BytesIO()
+        self.serialize(reference.get_object(), data)
+        data = data.getvalue()
+        self.copying.discard(key)
+
+        if key in self.numbers:
+            self.write_data(self.numbers[key], data)
+            return self.numbers[key]
+
+        data_hash = hashlib.sha1(data).digest()
+
+        if data_hash not in self.hashes:
+            self.hashes[data_hash] = self.new_number()
+            self.write_data(self.hashes[data_hash], data)
+
+        self.numbers[key] = self.hashes[data_hash]
+        return self.numbers[key]
+
+
+    def new_number(self):
+        '''
+        Returns the next free object number of the output.
+        '''
+
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+
+    def write_object(self, number, pdf_object):
+        '''
+        Writes an object of the current input with a new number.
+
+        Parameters
+        ----------
+        number: Number of the object in the output
+
+        pdf_object: The object or an IndirectObject pointing to it
+        '''
+
+        from PyPDF2 import generic
+
+        if isinstance(pdf_object, generic.IndirectObject):
+            pdf_object = pdf_object.get_object()
+
+        data = io.BytesIO()
+        self.serialize(pdf_object, data)
+        self.write_data(number, data.getvalue())
+
+
+    def write_data(self, number, data):
+        '''
+        Writes an object that is already in pdf syntax.
+
+        Parameters
+        ----------
+        number: Number of the object in the output
+
+        data: The object in pdf syntax as bytes
+        '''
+
+        self.offsets[number] = self.output.tell()
+        self.output.write(b"%d 0 obj\n" % number)
+        self.output.write(data)
+        self.output.write(b"\nendobj\n")
+
+
+    def serialize(self, pdf_object, data):
+        '''
+        Writes an object in pdf syntax, with references to other 
+        objects changed to their numbers in the output.
+
+        Parameters
+        ----------
+        pdf_object: The object
+
+        data: File-like object to write to
+        '''
+
+        from PyPDF2 import generic
+
+        if isinstance(pdf_object, generic.IndirectObject):
+            data.write(b"%d 0 R" % self.number(pdf_object))
+
+        elif isinstance(pdf_object, generic.DictionaryObject):
+            is_page = pdf_object.get("/Type") == "/Page"
+            is_stream = isinstance(pdf_object, generic.StreamObject)
+            stream_data = pdf_object._data if is_stream else b""
+            data.write(b"<<")
+
+            if self.optimize and is_stream and "/Filter" not in pdf_object:
+                compressed = zlib.compress(stream_data, 9)
+
+                if len(compressed) < len(stream_data):
+                    stream_data = compressed
+                    data.write(b"\n/Filter /FlateDecode")
+
+            for key, value in pdf_object.items():
+
+                # the length of streams may be a reference, the stream 
+                # itself is known anyway
+                if is_stream and key == "/Length":
+                    continue
+
+                data.write(b"\n")
+                key.write_to_stream(data, None)
+                data.write(b" ")
+
+                # all pages are put into the page tree of the output
+                if is_page and key == "/Parent":
+                    data.write(b"2 0 R")
+                elif is_page and key == "/Annots":
+                    self.serialize_annotations(value, data)
+                else:
+                    self.serialize(value, data)
+
+            if is_stream:
+                data.write(b"\n/Length %d\n>>\nstream\n" % 
+                    len(stream_data))
+                data.write(stream_data)
+                data.write(b"\nendstream")
+            else:
+                data.write(b"\n>>")
+
+        elif isinstance(pdf_object, generic.ArrayObject):
+            data.write(b"[")
+
+            for value in pdf_object:
+                data.write(b" ")
+                self.serialize(value, data)
+
+            data.write(b" ]")
+
+        else:
+            pdf_object.write_to_stream(data, None)
+
+
+    def serialize_annotations(self, annotations, data):
+        '''
+        Writes the annotations of a page, like serialize, but every 
+        annotation gets its own object, see number.
+
+        Parameters
+        ----------
+        annotations: The /Annots of the page, an array or a reference 
+        to it
+
+        data: File-like object to write to
+        '''
+
+        from PyPDF2 import generic
+
+        annotations = annotations.get_object()
+
+        if not isinstance(annotations, generic.ArrayObject):
+            self.serialize(annotations, data)
+            return
+
+        data.write(b"[")
+
+        for annotation in annotations:
+            data.write(b" ")
+
+            if isinstance(annotation, generic.IndirectObject):
+                data.write(b"%d 0 R" % self.number(annotation, 
+                    shared=False))
+            else:
+                self.serialize(annotation, data)
+
+        data.write(b" ]")
+
+
+    def close(self):
+        '''
+        Writes the page tree, the catalog and the cross-reference table
+        and closes the pdf.
+        '''
+
+        self.offsets[2] = self.output.tell()
+        self.output.write(b"2 0 obj\n<< /Type /Pages /Kids [%s] /Count %d"
+            b" >>\nendobj\n" % (b" ".join(b"%d 0 R" % page 
+            for page in self.pages), len(self.pages)))
+
+        catalog = b"/Type /Catalog /Pages 2 0 R"
+
+        if len(self.outlines) > 0:
+            catalog += (b" /Outlines %d 0 R /PageMode /UseOutlines" % 
+                self.write_outlines())
+
+        self.offsets[1] = self.output.tell()
+        self.output.write(b"1 0 obj\n<< %s >>\nendobj\n" % catalog)
+
+        xref_offset = self.output.tell()
+        self.output.write(b"xref\n0 %d\n0000000000 65535 f \n" % 
+            len(self.offsets))
+
+        for offset in self.offsets[1:]:
+            # objects that could not be read are written as free
+            if offset is None:
+                self.output.write(b"0000000000 65535 f \n")
+            else:
+                self.output.write(b"%010d 00000 n \n" % offset)
+
+        self.output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\n"
+            b"startxref\n%d\n%%%%EOF\n" % (len(self.offsets), 
+            xref_offset))
+        self.output.close()
+
+        os.replace(self.temp_path, self.path)
+
+
+    def discard(self):
+        '''
+        Closes and removes the pdf without writing it under its path, 
+        e.g. because an input could not be read.
+        '''
+
+        self.output.close()
+
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+    def write_outlines(self):
+        '''
+        Writes the bookmarks, one after another without nesting, and 
+        returns the number of the object that holds them.
+        '''
+
+        from PyPDF2 import generic
+
+        root = self.new_number()
+        numbers = [self.new_number() for outline in self.outlines]
+
+        for index, (title, page_numbers) in enumerate(self.outlines):
+            data = io.BytesIO()
+            data.write(b"<< /Title ")
+            generic.create_string_object(title).write_to_stream(data, None)
+            data.write(b" /Parent %d 0 R /Dest [%d 0 R /Fit]" % (root, 
+                page_numbers[0]))
+
+            if index > 0:
+                data.write(b" /Prev %d 0 R" % numbers[index - 1])
+            if index < len(numbers) - 1:
+                data.write(b" /Next %d 0 R" % numbers[index + 1])
+
+            data.write(b" >>")
+            self.write_data(numbers[index], data.getvalue())
+
+        self.write_data(root, b"<< /Type /Outlines /First %d 0 R /Last %d "
+            b"0 R /Count %d >>" % (numbers[0], numbers[-1], len(numbers)))
+
+        return root
+
+
+def optimize_pdf(merged_pdf, page_sources):
+    '''
+    Writes the combined pdf of a student with StreamingPdfWriter, which
+    merges identical objects and compresses streams, and linearizes it,
+    so it opens instantly on tablets (see linearize_pdf). Both steps 
+    work on a temporary file, which only replaces the combined pdf when
+    both succeeded, and is removed otherwise. Prints how much smaller 
+    the pdf is than the pdfs it was made of and how long that took, and
+    adds both to optimize_stats.
+
+    Parameters
+    ----------
+    merged_pdf: Path of the combined pdf
+
+    page_sources: List of pdfs as file-like objects, paths or 
+    ZipMembers, see merge_categories
+    '''
+
+    start = time.perf_counter()
+    bytes_in = 0
+
+    for page_source in page_sources:
+        if isinstance(page_source, io.BytesIO):
+            bytes_in += len(page_source.getbuffer())
+        elif isinstance(page_source, (str, ZipMember)):
+            bytes_in += file_size(page_source)
+        else:
+            bytes_in += os.fstat(page_source.fileno()).st_size
+
+    optimized = partial_output_path(merged_pdf)
+
+    try:
+        with StreamingPdfWriter(optimized, optimize=True) as writer:
+            for page_source in page_sources:
+                writer.append(page_source)
+
+        linearize_pdf(optimized)
+        os.replace(optimized, merged_pdf)
+
+    finally:
+        if os.path.exists(optimized):
+            os.remove(optimized)
+
+    seconds = time.perf_counter() - start
+    bytes_out = os.path.getsize(merged_pdf)
+    trace_note(pages=writer.page_count, bytes_out=bytes_out)
+
+    optimize_stats["optimize_bytes_in"] += bytes_in
+    optimize_stats["optimize_bytes_out"] += bytes_out
+    optimize_stats["optimize_seconds"] += seconds
+
+    print("%s: %.1f MB -> %.1f MB (%+.0f%%) in %.2f s" % (
+        os.path.basename(merged_pdf), bytes_in / 1024 / 1024, 
+        bytes_out / 1024 / 1024, 
+        (bytes_out - bytes_in) / max(bytes_in, 1) * 100, seconds))
+
+
+def linearize_pdf(path):
+    '''
+    Rewrites a pdf linearized ("fast web view"), so viewers can show 
+    the first page before the whole file is loaded, and with objects 
+    packed into compressed object streams. Needs the optional package 
+    pikepdf or the program qpdf. Returns whether the pdf was 
+    linearized. The pdf is only replaced if linearizing succeeded, the
+    temporary file is always removed.
+
+    Parameters
+    ----------
+    path: Path of the pdf
+    '''
+
+    linearized = partial_output_path(path)
+
+    try:
+        try:
+            import pikepdf
+
+            with pikepdf.open(path) as pdf:
+                pdf.save(linearized, linearize=True, 
+                    object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+        except ImportError:
+            qpdf = find_program("qpdf")
+
+            if not qpdf:
+                return False
+
+            # qpdf exits with 3 if there were only warnings
+            if subprocess.run([qpdf, "--linearize", 
+                    "--object-streams=generate", path, linearized]
+                    ).returncode not in (0, 3):
+                return False
+
+        os.replace(linearized, path)
+        return True
+
+    finally:
+        if os.path.exists(linearized):
+            os.remove(linearized)
+
+
+def partial_output_path(path):
+    '''
+    Returns a path for writing a file next to path, which then replaces
+    path with os.replace, so path is never half written. The name is 
+    random, so several writers of the same path don't get in each 
+    other's way, and the file gets the usual permissions, unlike with 
+    tempfile.mkstemp. Files left behind by an interrupted run end with 
+    ".part" and are removed by clean_partial_outputs.
+
+    Parameters
+    ----------
+    path: Path of the file to write
+    '''
+
+    return path + "." + os.urandom(4).hex() + ".part"
+
+
+@contextlib.contextmanager
+def open_mapped(page_source):
+    '''
+    Context manager that opens a pdf for StreamingPdfWriter and closes 
+    it afterwards. Files on disk are memory-mapped, so the operating 
+    system loads only the parts that are read and can drop them again.
+    Pdfs inside a zip are copied to a temporary file first, because 
+    pdfs are not read from front to back.
+
+    Parameters
+    ----------
+    page_source: Path, ZipMember or file-like object of the pdf
+    '''
+
+    with contextlib.ExitStack() as stack:
+        if isinstance(page_source, str):
+            pdf = stack.enter_context(open(page_source, "rb"))
+
+        elif isinstance(page_source, ZipMember):
+            pdf = stack.enter_context(tempfile.TemporaryFile(
+                prefix="reistee-"))
+
+            with page_source.open() as source:
+                shutil.copyfileobj(source, pdf)
+
+        else:
+            pdf = stack.enter_context(page_source)
+
+        # empty files can't be mapped and are not a pdf anyway
+        if isinstance(page_source, io.BytesIO) or (
+                os.fstat(pdf.fileno()).st_size == 0):
+            pdf.seek(0)
+            yield pdf
+
+        else:
+            yield stack.enter_context(mmap.mmap(pdf.fileno(), 0, 
+                access=mmap.ACCESS_READ))
+
+
+class ZipMember:
+    '''
+    A file inside a zip, which is read directly from the zip without 
+    extracting it. Can be used instead of a path in the file lists. 
+    Files created from a member or file (e.g. jpgs converted from heic
+    images) are kept in memory and passed as data.
+
+    Parameters
+    ----------
+    zip_ref: zipfile.ZipFile the file is in
+
+    name: Name of the file inside the zip, including its folders
+
+    data: Content of the file, if it is not read from the zip
+
+    inner_name: Name of the file inside zip_ref, if it differs from 
+    name, e.g. for files in an archive inside the zip (see 
+    expand_archive), whose name includes the name of the archive
+    '''
+
+    def __init__(self, zip_ref, name, data=None, inner_name=None):
+        self.zip_ref = zip_ref
+        self.name = name
+        self.data = data
+        self.inner_name = inner_name or name
+
+
+    def __str__(self):
+        return self.name
+
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+
+    def open(self):
+        '''
+        Returns a file-like object for reading the file.
+        '''
+
+        if self.data is not None:
+            return io.BytesIO(self.data)
+
+        return self.zip_ref.open(self.inner_name)
+
+
+def open_file(file):
+    '''
+    Opens a file from the file lists for reading, no matter if it is
+    a path or a ZipMember.
+
+    Parameters
+    ----------
+    file: Path or ZipMember
+    '''
+
+    if isinstance(file, str):
+        return open(file, "rb")
+
+    return file.open()
+
+
+def file_size(file):
+    '''
+    Returns the size of a file from the file lists in bytes, no matter 
+    if it is a path or a ZipMember.
+
+    Parameters
+    ----------
+    file: Path or ZipMember
+    '''
+
+    if isinstance(file, str):
+        return os.path.getsize(file)
+
+    if file.data is not None:
+        return len(file.data)
+
+    return file.zip_ref.getinfo(file.inner_name).file_size
+
+
+def heic_supported():
+    '''
+    Returns whether Pillow can open heic images itself, which needs the
+    optional package pillow-heif. It is imported the first time this is
+    called. Without it, heic images are converted with ImageMagick (see
+    heic_to_jpg).
+    '''
+
+    global heic_opener
+
+    if heic_opener is None:
+        try:
+            import pillow_heif
+            pillow_heif.register_heif_opener()
+            heic_opener = True
+
+        except ImportError:
+            heic_opener = False
+
+    return heic_opener
+
+
+@traced
+def heic_to_jpg(heic_file):
+    '''
+    Converts a heic image into a jpg with ImageMagick, if pillow-heif is
+    not installed. The jpg is returned as bytes. Returns None if 
+    ImageMagick is not installed or the image could not be converted.
+
+    Parameters
+    ----------
+    heic_file: Path or ZipMember of the heic image
+    '''
+
+    if not check_imagemagick_install():
+        print(".heic Image found, but no ImageMagick installed."+
+            " Please install from https://imagemagick.org/")
+        return None
+
+    # ImageMagick only works on files
+    with tempfile.TemporaryDirectory(prefix="reistee-") as work_dir:
+        jpg_file = os.path.join(work_dir, "image.jpg")
+
+        if not isinstance(heic_file, str):
+            with heic_file.open() as source, open(os.path.join(work_dir, 
+                    "image.heic"), "wb") as dest:
+                shutil.copyfileobj(source, dest)
+
+            heic_file = os.path.join(work_dir, "image.heic")
+
+        with trace_span("magick", target=os.path.basename(heic_file)):
+            im = subprocess.Popen([find_program("magick"), heic_file, 
+                jpg_file])
+            im.wait()
+
+        if not os.path.isfile(jpg_file):
+            return None
+
+        with open(jpg_file, "rb") as jpg:
+            return jpg.read()
+
+
+def categorize_member(member, file_lists):
+    '''
+    Categorizes a file that is not a file on disk (see ZipMember) into 
+    the correct file list, like categorise_file. Heic images are 
+    converted into jpgs first if pillow-heif is not installed. Returns 
+    False if the file format is not recognized.
+
+    Parameters
+    ----------
+    member: ZipMember of the file
+
+    file_lists: List of file-lists that each store the files of
+    the correct format
+    '''
+
+    if member.name.lower().endswith(".heic") and not heic_supported():
+        jpg = convert_cached(member, "heic", lambda: heic_to_jpg(member))
+
+        if jpg is not None:
+            member = ZipMember(None, member.name[0:-5] + ".jpg", jpg)
+
+    category = file_category(member.name, member)
+
+    if category is None:
+        return False
+
+    file_lists[category].append(member)
+    return True
+
+
+def new_archive_budget():
+    '''
+    Returns how many bytes and files may still be unpacked from the 
+    archives of a student, see expand_archive, and the archives that 
+    are kept open while their files are used ("open"), which are closed
+    with close_archives.
+    '''
+
+    return {"bytes": archive_max_bytes * 1024 * 1024, 
+        "members": archive_max_members, "open": []}
+
+
+def close_archives(budget):
+    '''
+    Closes the archives of a student that were kept open for reading 
+    their files (see read_zip_archive) and the temporary copies they 
+    were read from. Must be called before the student folder is 
+    removed, windows can't remove files that are open.
+
+    Parameters
+    ----------
+    budget: See new_archive_budget
+    '''
+
+    for archive_file in budget["open"]:
+        archive_file.close()
+
+    budget["open"].clear()
+
+
+def archive_ending(filename):
+    '''
+    Returns the file ending of an archive that is unpacked (see 
+    ARCHIVE_ENDINGS), no matter if written in upper or lower case, or 
+    "" if the file is no such archive.
+
+    Parameters
+    ----------
+    filename: Name of the file
+    '''
+
+    for ending in ARCHIVE_ENDINGS:
+        if filename.lower().endswith(ending):
+            return ending
+
+    return ""
+
+
+def expand_archive(archive, budget, depth=1):
+    '''
+    Returns the files inside an archive a student uploaded as list of 
+    ZipMembers, named like the archive with the path inside the archive
+    appended, so they are sorted and reported where the archive is. 
+    Archives inside the archive are unpacked as well, up to 
+    archive_max_depth. Files that are no archive are returned as they 
+    are, as list with only the file. If the archive can't be unpacked, 
+    e.g. because it is damaged, encrypted or larger than the rest of the 
+    budget, it is returned as it is as well, so it is copied like any 
+    file with unknown format. Nothing is written to disk except 
+    temporary files for large archives inside zips; names inside the 
+    archive are never used as paths.
+
+    Parameters
+    ----------
+    archive: Path or ZipMember of the file
+
+    budget: Bytes and files that may still be unpacked for the student,
+    see new_archive_budget. Reduced by the files of the archive.
+
+    depth: How deep the archive is inside other archives, 1 for archives
+    in the student folder
+    '''
+
+    name = str(archive)
+    ending = archive_ending(name)
+
+    if not ending or depth > archive_max_depth:
+        return [archive]
+
+    try:
+        if ending == ".zip":
+            members = read_zip_archive(archive, budget)
+        elif ending == ".7z":
+            members = read_7z_archive(archive, budget)
+        else:
+            members = read_tar_archive(archive, budget)
+
+    # e.g. damaged archive, the student gets the archive as it is
+    except Exception as error:
+        print("Can't unpack " + os.path.basename(name) + ": " + str(error))
+        members = None
+
+    if members is None:
+        return [archive]
+
+    return [member for archive_member in members 
+        for member in expand_archive(archive_member, budget, depth + 1)]
+
+
+def take_from_budget(name, sizes, budget):
+    '''
+    Reduces the budget of a student by the files of an archive. Returns
+    False, and leaves the budget as it is, if the files don't fit.
+
+    Parameters
+    ----------
+    name: Name of the archive, for the message
+
+    sizes: List of the sizes of the files in the archive
+
+    budget: See new_archive_budget
+    '''
+
+    if len(sizes) > budget["members"] or sum(sizes) > budget["bytes"]:
+        print("Not unpacking " + os.path.basename(name) + ": " + 
+            str(len(sizes)) + " files with " + 
+            str(round(sum(sizes) / 1024 / 1024)) + " MB are more than " +
+            "allowed (see --archive-max-files and --archive-max-size).")
+        return False
+
+    budget["members"] -= len(sizes)
+    budget["bytes"] -= sum(sizes)
+
+    return True
+
+
+def open_archive(archive):
+    '''
+    Returns a seekable file-like object with an archive, for reading 
+    the files inside it. Archives inside zips are copied into a 
+    temporary file first, which is kept in memory if it is small.
+
+    Parameters
+    ----------
+    archive: Path or ZipMember of the archive
+    '''
+
+    if isinstance(archive, str):
+        return open(archive, "rb")
+
+    if archive.data is not None:
+        return io.BytesIO(archive.data)
+
+    copy = tempfile.SpooledTemporaryFile(16 * 1024 * 1024, 
+        prefix="reistee-")
+
+    with archive.open() as source:
+        shutil.copyfileobj(source, copy)
+
+    copy.seek(0)
+    return copy
+
+
+def read_zip_archive(archive, budget):
+    '''
+    Returns the files inside a zip a student uploaded as ZipMembers that
+    are read from the zip when they are needed, see expand_archive. 
+    Returns None if the zip is encrypted or too large for the budget.
+
+    Parameters
+    ----------
+    archive: Path or ZipMember of the zip
+
+    budget: See new_archive_budget
+    '''
+
+    archive_file = open_archive(archive)
+
+    try:
+        zip_ref = zipfile.ZipFile(archive_file)
+
+    except Exception:
+        archive_file.close()
+        raise
+
+    # the zip stays open as long as its files are used, see 
+    # close_archives. Closing the ZipFile does not close a file that 
+    # was passed to it.
+    budget["open"] += [zip_ref, archive_file]
+    infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+    if any(info.flag_bits & 0x1 for info in infos):
+        print("Can't unpack " + os.path.basename(str(archive)) + 
+            ": it is protected by a password.")
+        return None
+
+    if not take_from_budget(str(archive), 
+            [info.file_size for info in infos], budget):
+        return None
+
+    return [ZipMember(zip_ref, str(archive) + "/" + info.filename, 
+        inner_name=info.filename) for info in infos]
+
+
+def read_tar_archive(archive, budget):
+    '''
+    Returns the files inside a tar a student uploaded (also compressed 
+    with gzip, bzip2 or xz) as ZipMembers with their content, see 
+    expand_archive. Returns None if the tar is too large for the 
+    budget.
+
+    Parameters
+    ----------
+    archive: Path or ZipMember of the tar
+
+    budget: See new_archive_budget
+    '''
+
+    with open_archive(archive) as archive_file:
+        with tarfile.open(fileobj=archive_file, mode="r:*") as tar:
+
+            # links and devices are left out
+            infos = [info for info in tar.getmembers() if info.isfile()]
+
+            if not take_from_budget(str(archive), 
+                    [info.size for info in infos], budget):
+                return None
+
+            return [ZipMember(None, str(archive) + "/" + info.name, 
+                tar.extractfile(info).read()) for info in infos]
+
+
+def read_7z_archive(archive, budget):
+    '''
+    Returns the files inside a 7z archive a student uploaded as 
+    ZipMembers with their content, see expand_archive. Needs the 
+    optional package py7zr. Returns None if it is not installed or the
+    archive is too large for the budget.
+
+    Parameters
+    ----------
+    archive: Path or ZipMember of the 7z archive
+
+    budget: See new_archive_budget
+    '''
+
+    try:
+        import py7zr
+        import py7zr.io
+
+    except ImportError:
+        print(".7z archive found, but py7zr is not installed, so it is " +
+            "copied as it is. Install it with pip install py7zr.")
+        return None
+
+    with open_archive(archive) as archive_file:
+        with py7zr.SevenZipFile(archive_file, "r") as seven_zip:
+            infos = [info for info in seven_zip.list() 
+                if not info.is_directory]
+
+            if not take_from_budget(str(archive), 
+                    [info.uncompressed for info in infos], budget):
+                return None
+
+            factory = py7zr.io.BytesIOFactory(budget["bytes"] + sum(
+                info.uncompressed for info in infos))
+            seven_zip.extractall(factory=factory)
+
+    members = []
+
+    for info in infos:
+        content = factory.get(info.filename)
+        content.seek(0)
+        members.append(ZipMember(None, str(archive) + "/" + info.filename,
+            content.read()))
+
+    return members
+
+
+@traced
+def iterate_zip_and_categorize(zip_ref, student_prefix, 
+                               archive_budget=None):
+    '''
+    Categorizes all files of a student inside a zip into the correct
+    file list without extracting them. Returns a list of filled 
+    file-lists, like iterate_and_categorize, and a list of the files 
+    with unrecognized format. All lists contain ZipMembers.
+
+    Parameters
+    ----------
+    zip_ref: zipfile.ZipFile with the student solutions
+
+    student_prefix: Name of the folder of the student inside the zip
+
+    archive_budget: Budget for unpacking the archives of the student, 
+    see iterate_and_categorize
+    '''
+
+    file_lists = ([], [], [])
+    unrecognized_files = []
+
+    if archive_budget is None:
+        archive_budget = new_archive_budget()
+
+    for info in zip_ref.infolist():
+
+        if (info.is_dir() or 
+                not info.filename.startswith(student_prefix + "/")):
+            continue
+
+        members = expand_archive(ZipMember(zip_ref, info.filename), 
+            archive_budget)
+
+        for member in members:
+            if not categorize_member(member, file_lists):
+                unrecognized_files.append(member)
+
+    skip_duplicates(student_prefix, file_lists)
+
+    return file_lists, unrecognized_files
+
+
+def process_zip_student(zip_path, student_prefix, dir_name):
+    '''
+    Runs all steps for one student directly on the zip, so only the
+    combined pdf and files with unrecognized format are written to
+    disk. Returns a tuple of the student folder, an error message, 
+    which is None if everything went fine, and statistics (see 
+    process_student).
+
+    Parameters
+    ----------
+    zip_path: Path of the zip with the student solutions.
+
+    student_prefix: Name of the folder of the student inside the zip.
+
+    dir_name: Main dir, into which the merged pdf will be placed.
+    '''
+
+    curr_student = os.path.join(dir_name, student_prefix)
+    start = time.perf_counter()
+    archive_budget = new_archive_budget()
+
+    try:
+        with trace_span("student", target=student_prefix):
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                file_lists, unrecognized_files = (
+                    iterate_zip_and_categorize(zip_ref, student_prefix,
+                        archive_budget))
+
+                for unrecognized_file in unrecognized_files:
+                    move_file_to_folder(unrecognized_file, curr_student)
+
+                page_sources = merge_files_per_category(curr_student, 
+                    file_lists)
+
+                pdf_data = merge_categories(curr_student, page_sources)
+
+    except Exception:
+        return curr_student, traceback.format_exc(), collect_stats(start)
+
+    finally:
+        close_archives(archive_budget)
+
+    stats = collect_stats(start)
+
+    if pdf_data is not None:
+        stats["pdf_data"] = pdf_data
+
+    return curr_student, None, stats
+
+
+def process_student(student_folder):
+    '''
+    Runs all steps for one student: categorize the files, create a pdf
+    for each category, merge them into one combined pdf and remove the 
+    student folder. Returns a tuple of the student folder, an error
+    message, which is None if everything went fine, and a dict of 
+    statistics (see collect_stats), with return_pdfs also the content of
+    the combined pdf as "pdf_data". Errors are returned instead of 
+    raised, so one broken submission does not stop the other students
+    when running in a worker process. The folder of a student that 
+    failed is kept, so no files get lost.
+
+    Parameters
+    ----------
+    student_folder: Path to the folder of the student.
+    '''
+
+    start = time.perf_counter()
+    archive_budget = new_archive_budget()
+
+    try:
+        with trace_span("student", 
+                target=os.path.basename(student_folder)):
+            categorized_files = iterate_and_categorize(student_folder, 
+                archive_budget)
+
+            page_sources = merge_files_per_category(student_folder, 
+                categorized_files)
+
+            pdf_data = merge_categories(student_folder, page_sources)
+
+    except Exception:
+        return (student_folder, traceback.format_exc(), 
+            collect_stats(start))
+
+    # the archives of the student must be closed before the folder is 
+    # removed, see close_archives
+    finally:
+        close_archives(archive_budget)
+
+    # Remove student dir (cleanup)
+    try:
+        shutil.rmtree(student_folder)
+
+    except OSError:
+        print("Einige Daten konnten nicht gelöscht werden, da " + 
+        "möglicherweise ein anderer Prozess auf sie zugreift. Dies "+
+        "kann durch beschädigte Dateien entstehen.")
+
+    stats = collect_stats(start)
+
+    if pdf_data is not None:
+        stats["pdf_data"] = pdf_data
+
+    return student_folder, None, stats
+
+
+def collect_stats(start=None):
+    '''
+    Returns the statistics of this process since the last call as dict,
+    currently hits and misses of the conversion cache, the savings of
+    optimize_pdf, the times of timing_stats and, while profiling, the 
+    recorded events as list "trace_events".
+
+    Parameters
+    ----------
+    start: Time (time.perf_counter) the current student was started, 
+    for adding how long it took as "student_seconds"
+    '''
+
+    stats = dict(timing_stats)
+
+    for name in timing_stats:
+        timing_stats[name] = 0
+
+    if start is not None:
+        stats["student_seconds"] = time.perf_counter() - start
+
+    if cache is not None:
+        stats.update(cache.take_stats())
+
+    if optimize_pdfs:
+        stats.update(optimize_stats)
+
+        for name in optimize_stats:
+            optimize_stats[name] = 0
+
+    if profiler is not None:
+        stats["trace_events"] = profiler.take_events()
+
+    return stats
+
+
+def get_worker_settings():
+    '''
+    Returns the settings of this process that worker processes need,
+    as dict of setting name and value (see WORKER_SETTINGS).
+    '''
+
+    return {name: globals()[name] for name in WORKER_SETTINGS}
+
+
+def init_worker(settings):
+    '''
+    Initializes a worker process of the process pool. Takes over the
+    settings of the main process and makes sure the document converter 
+    of the worker is shut down when the worker exits. Every worker 
+    starts its own converter, so several workers can convert documents 
+    at the same time.
+
+    Parameters
+    ----------
+    settings: Settings of the main process, see get_worker_settings
+    '''
+
+    global profiler
+
+    globals().update(settings)
+
+    if profiling:
+        profiler = Profiler()
+
+    multiprocessing.util.Finalize(None, close_converter, exitpriority=10)
+
+
+def create_worker_pool(jobs, settings=None):
+    '''
+    Starts a pool of jobs worker processes for processing students, 
+    which take over the settings of this process (see init_worker).
+
+    Parameters
+    ----------
+    jobs: Number of worker processes
+
+    settings: Settings for the workers instead of the ones of this 
+    process, see Options.worker_settings
+    '''
+
+    if settings is None:
+        settings = get_worker_settings()
+
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+        initializer=init_worker, initargs=(settings,))
+
+
+def run_student_jobs(student_jobs, jobs=1, pool=None, on_result=None):
+    '''
+    Runs the jobs of all students, either one after another or, with 
+    more than one job, in worker processes. Every student job is a 
+    function that returns a tuple of the student folder, an error 
+    message and statistics (see process_student). Errors and a summary
+    of the statistics are printed at the end. Returns a list of these 
+    tuples.
+
+    Parameters
+    ----------
+    student_jobs: List of tuples of the student folder, the function
+    and its arguments.
+
+    jobs: Number of students that are processed at the same time.
+
+    pool: Worker pool to use instead of starting a new one (see 
+    create_worker_pool), e.g. one that is kept running by watch_folder.
+    It is not shut down.
+
+    on_result: Function that is called with the index of the job and 
+    its result as soon as a student is finished. The workers start the
+    jobs in their order, but may finish them in any order.
+    '''
+
+    results = [None] * len(student_jobs)
+
+    def add_result(index, result):
+        results[index] = result
+        if on_result is not None:
+            on_result(index, result)
+
+    if pool is None and (jobs <= 1 or len(student_jobs) <= 1):
+        try:
+            for index, (student_folder, function, args) in enumerate(
+                    student_jobs):
+                add_result(index, function(*args))
+
+        finally:
+            close_converter()
+
+    else:
+        with contextlib.ExitStack() as stack:
+            if pool is None:
+                pool = stack.enter_context(create_worker_pool(
+                    min(jobs, len(student_jobs))))
+
+            futures = {pool.submit(function, *args): index 
+                for index, (student_folder, function, args) in 
+                enumerate(student_jobs)}
+
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+
+                try:
+                    result = future.result()
+
+                # e.g. worker process crashed
+                except Exception:
+                    result = (student_jobs[index][0], 
+                        traceback.format_exc(), {})
+
+                add_result(index, result)
+
+    total_stats = {}
+
+    for student_folder, error, stats in results:
+        if error is not None:
+            print("Error while processing " + 
+                os.path.basename(student_folder) + ":\n" + error)
+
+        for name, value in stats.items():
+            if isinstance(value, list):
+                total_stats[name] = total_stats.get(name, []) + value
+            else:
+                total_stats[name] = total_stats.get(name, 0) + value
+
+    if total_stats.get("optimize_bytes_in"):
+        print("Optimized pdfs: %.1f MB -> %.1f MB (%+.0f%%) in %.1f s" % (
+            total_stats["optimize_bytes_in"] / 1024 / 1024, 
+            total_stats["optimize_bytes_out"] / 1024 / 1024,
+            (total_stats["optimize_bytes_out"] - 
+                total_stats["optimize_bytes_in"]) / 
+                total_stats["optimize_bytes_in"] * 100,
+            total_stats["optimize_seconds"]))
+
+    if total_stats.get("cache_hits") or total_stats.get("cache_misses"):
+        print("Conversion cache: " + str(total_stats["cache_hits"]) + 
+            " hits, " + str(total_stats["cache_misses"]) + " misses")
+
+    return results
+
+
+def student_folder_jobs(student_folders):
+    '''
+    Returns the student jobs (see run_student_jobs) for extracted 
+    student folders.
+
+    Parameters
+    ----------
+    student_folders: Paths of the student folders
+    '''
+
+    return [(student_folder, process_student, (student_folder,)) 
+        for student_folder in student_folders]
+
+
+def zip_student_jobs(zip_path, dir_name, student_prefixes):
+    '''
+    Returns the student jobs (see run_student_jobs) for students that 
+    are read directly from a zip.
+
+    Parameters
+    ----------
+    zip_path: Path of the zip with the student solutions.
+
+    dir_name: Main dir, into which the merged pdfs will be placed.
+
+    student_prefixes: Names of the student folders inside the zip
+    '''
+
+    return [(os.path.join(dir_name, student_prefix), process_zip_student,
+        (zip_path, student_prefix, dir_name)) 
+        for student_prefix in sorted(student_prefixes)]
+
+
+def read_submissions(source):
+    '''
+    Returns the files of every student in a zip or folder from IServ as
+    dict of student folder name and a dict of the files of the student,
+    which maps the path of every file inside the student folder to its 
+    size and hash. Files in zips are identified by the crc32 stored in 
+    the zip, so the zip doesn't have to be unpacked for that. Files 
+    outside of student folders are ignored.
+
+    Parameters
+    ----------
+    source: Path of the zip or folder
+    '''
+
+    submissions = {}
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                student, separator, name = info.filename.partition("/")
+
+                if not separator:
+                    continue
+
+                files = submissions.setdefault(student, {})
+
+                if not info.is_dir():
+                    files[name] = [info.file_size, 
+                        "crc32:%08x" % info.CRC]
+
+    else:
+        for entry in os.scandir(source):
+            if not entry.is_dir():
+                continue
+
+            files = submissions.setdefault(entry.name, {})
+
+            for dirpath, dirnames, filenames in os.walk(entry.path):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, entry.path).replace(
+                        os.sep, "/")
+                    files[name] = [os.path.getsize(path), 
+                        "sha256:" + hash_file(path)]
+
+    return submissions
+
+
+def manifest_path(dir_name):
+    '''
+    Returns the path of the manifest of an output folder, which is 
+    placed next to the folder.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    return os.path.normpath(dir_name) + ".manifest.json"
+
+
+def load_manifest(dir_name):
+    '''
+    Loads the manifest written by an earlier run into dir_name, see 
+    process_archive. Returns None if there is no readable manifest.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    try:
+        with open(manifest_path(dir_name), encoding="utf-8") as manifest:
+            return json.load(manifest)
+
+    except (OSError, ValueError):
+        return None
+
+
+def journal_path(dir_name):
+    '''
+    Returns the path of the journal of a run into an output folder, 
+    which is placed next to the folder while the run is going on.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    return os.path.normpath(dir_name) + ".journal.json"
+
+
+def load_journal(dir_name):
+    '''
+    Loads the journal of an earlier run into dir_name that did not 
+    finish, see record_student. Returns None if there is none.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    try:
+        with open(journal_path(dir_name), encoding="utf-8") as journal:
+            return json.load(journal)
+
+    except (OSError, ValueError):
+        return None
+
+
+def record_student(prepared, result):
+    '''
+    Records in the journal of a source that a student is finished, as
+    soon as it is. The journal is written atomically, so it is never 
+    half written, even if reistee is killed.
+
+    Parameters
+    ----------
+    prepared: State of the source returned by prepare_source
+
+    result: Tuple of student folder, error message and statistics, see
+    run_student_jobs
+    '''
+
+    student_folder, error, stats = result
+    student = os.path.basename(student_folder)
+    dir_name = prepared["dir_name"]
+
+    prepared["journal"]["students"][student] = {
+        "files": prepared["submissions"][student],
+        "pdf": os.path.isfile(merged_pdf_path(dir_name, student)),
+        "failed": error is not None}
+
+    write_json_atomic(journal_path(dir_name), prepared["journal"])
+
+
+def clean_partial_outputs(dir_name):
+    '''
+    Removes what an interrupted run may have left besides the pdfs of 
+    finished students: the temporary files of pdfs that were being 
+    written (see partial_output_path) in dir_name, and of the results 
+    zip and class pdf next to it (see OutputSinks).
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    partial_outputs = glob.glob(os.path.join(glob.escape(dir_name), 
+        "*.part")) + glob.glob(glob.escape(os.path.normpath(dir_name)) + 
+        ".*.part")
+
+    for partial_output in partial_outputs:
+        if os.path.isfile(partial_output):
+            os.remove(partial_output)
+
+
+def write_json_atomic(path, data):
+    '''
+    Writes data as json file. The file is written under a temporary name
+    first and then renamed, so there is never a half written file, even
+    if reistee is killed while writing. Every call gets its own 
+    temporary name, like the entries of ConversionCache, so runs in 
+    several threads or processes can write the same file (e.g. the 
+    cost model) at the same time.
+
+    Parameters
+    ----------
+    path: Path of the json file
+
+    data: Data to write
+    '''
+
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(
+        os.path.abspath(path)), suffix=".tmp")
+
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as temp:
+            json.dump(data, temp, indent=1, ensure_ascii=False)
+
+        os.replace(temp_path, path)
+
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def conversion_settings(settings=None):
+    '''
+    Returns the settings that change how the merged pdfs look. If they
+    differ from the last run, all students are rebuilt.
+
+    Parameters
+    ----------
+    settings: Settings of the run, see Options.worker_settings. By 
+    default the ones of this process.
+    '''
+
+    if settings is None:
+        settings = get_worker_settings()
+
+    return {name: settings[name] for name in ("image_dpi", 
+        "jpeg_quality", "grayscale_images", "converter_backend", 
+        "optimize_pdfs", "keep_duplicates", "scan_mode", 
+        "archive_max_bytes", "archive_max_members", "archive_max_depth")}
+
+
+def merged_pdf_path(dir_name, student):
+    '''
+    Returns the path of the merged pdf of a student.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+
+    student: Name of the student folder
+    '''
+
+    return os.path.join(dir_name, reverse_student_name(student) + ".pdf")
+
+
+def remove_student_outputs(dir_name, student):
+    '''
+    Removes everything an earlier run created for a student: the 
+    merged pdf, copies of files with unrecognized format (which are 
+    named like the pdf, maybe with a number) and the student folder, 
+    if it was left over.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+
+    student: Name of the student folder
+    '''
+
+    student_name_reversed = reverse_student_name(student)
+
+    for entry in os.scandir(dir_name):
+        name = os.path.splitext(entry.name)[0]
+
+        if entry.is_file() and (name == student_name_reversed or 
+                name.startswith(student_name_reversed) and 
+                name[len(student_name_reversed):].isdigit()):
+            os.remove(entry.path)
+
+    shutil.rmtree(os.path.join(dir_name, student), ignore_errors=True)
+
+
+def prepare_source(source, dir_name, options, run_profiler=None):
+    '''
+    Prepares creating the merged pdfs for all students of a zip or 
+    folder from IServ in dir_name: finds the students whose files 
+    changed since the last run (see process_archive), removes their
+    old outputs and extracts or copies their files. Returns a dict with
+    the state of the source, including the student jobs that still 
+    have to be run (see run_student_jobs) as "student_jobs" and the 
+    students that are not processed again as "unchanged_students". 
+    Pass it to finish_source together with the results of these jobs.
+
+    Every finished student is recorded in a journal next to dir_name
+    (see record_student), which is removed when the run is finished. 
+    If a journal is found, the last run was interrupted: with resume, 
+    the students it finished are skipped and leftovers are removed,
+    otherwise all students are processed again.
+
+    Parameters
+    ----------
+    source: Path of the zip or folder
+
+    dir_name: Main dir, into which the merged pdfs will be placed.
+
+    options: Options of the run, see Options
+
+    run_profiler: Profiler for the steps of the run in this process, 
+    None if not profiling
+    '''
+
+    settings = conversion_settings(options.worker_settings())
+    stream = options.stream
+
+    submissions = read_submissions(source)
+    manifest = load_manifest(dir_name)
+    journal = load_journal(dir_name)
+
+    if (options.rebuild or manifest is None or 
+            not os.path.isdir(dir_name) or 
+            manifest.get("settings") != settings):
+        manifest = {"students": {}}
+
+    if journal is not None and os.path.isdir(dir_name):
+        if (options.resume and not options.rebuild and 
+                journal.get("settings") == settings):
+            finished = {student: known for student, known in 
+                journal["students"].items() if not known["failed"]}
+
+            print("Resuming the interrupted run into " + dir_name + ": " +
+                str(len(finished)) + " students are already finished.")
+
+            for student, known in finished.items():
+                manifest["students"][student] = {"files": known["files"],
+                    "pdf": known["pdf"]}
+
+            clean_partial_outputs(dir_name)
+
+        else:
+            print("The last run into " + dir_name + " was interrupted " +
+                "and is started over. Use --resume to continue it.")
+
+            # the interrupted run may have removed outputs of students 
+            # the manifest still knows
+            manifest = {"students": {}}
+
+    journal = {"settings": settings, "students": {}}
+    known_students = manifest["students"]
+    changed_students = []
+
+    for student, files in sorted(submissions.items()):
+        known = known_students.get(student)
+
+        if (known is None or known["files"] != files or 
+                known["pdf"] and not os.path.isfile(
+                    merged_pdf_path(dir_name, student))):
+            changed_students.append(student)
+
+    removed_students = sorted(set(known_students) - set(submissions))
+
+    if len(known_students) > 0:
+        print(os.path.basename(source) + ": " + 
+            str(len(changed_students)) + " students changed, " + 
+            str(len(submissions) - len(changed_students)) + 
+            " unchanged students are skipped.")
+
+    for student in removed_students:
+        print("No longer in " + os.path.basename(source) + ": " + student)
+        del known_students[student]
+
+    os.makedirs(dir_name, exist_ok=True)
+
+    for student in changed_students:
+        remove_student_outputs(dir_name, student)
+
+    # the extraction is recorded by the profiler of the run
+    extract_span = contextlib.nullcontext()
+    if run_profiler is not None:
+        extract_span = run_profiler.span("extract", 
+            {"target": os.path.basename(source)})
+
+    # files outside of student folders are copied as they are
+    if zipfile.is_zipfile(source):
+        with extract_span:
+            with zipfile.ZipFile(source, 'r') as zip_ref:
+                zip_ref.extractall(dir_name, [info for info in 
+                    zip_ref.infolist() if "/" not in info.filename or 
+                    not stream and info.filename.partition("/")[0] in 
+                    changed_students])
+
+        if stream:
+            student_jobs = zip_student_jobs(source, dir_name, 
+                changed_students)
+        else:
+            student_jobs = student_folder_jobs(
+                [os.path.join(dir_name, student) 
+                    for student in changed_students])
+
+    else:
+        with extract_span:
+            for entry in os.scandir(source):
+                if entry.is_dir() and entry.name in changed_students:
+                    shutil.copytree(entry.path, os.path.join(dir_name, 
+                        entry.name))
+                elif entry.is_file():
+                    shutil.copy2(entry.path, dir_name)
+
+        student_jobs = student_folder_jobs(
+            [os.path.join(dir_name, student) 
+                for student in changed_students])
+
+    write_json_atomic(journal_path(dir_name), journal)
+
+    return {"source": source, "dir_name": dir_name, 
+        "submissions": submissions, "manifest": manifest, 
+        "journal": journal, "settings": settings, 
+        "student_jobs": student_jobs, "unchanged_students": sorted(
+            set(submissions) - set(changed_students)), 
+        "profiling": run_profiler is not None,
+        "trace_events": run_profiler.take_events() if run_profiler else []}
+
+
+def finish_source(prepared, results):
+    '''
+    Records the results of the student jobs of a source in its manifest
+    and, while profiling, writes the recorded steps to 
+    dir_name + ".profile.json". Returns the results.
+
+    Parameters
+    ----------
+    prepared: State of the source returned by prepare_source
+
+    results: Results of the student jobs of the source, see 
+    run_student_jobs
+    '''
+
+    dir_name = prepared["dir_name"]
+    submissions = prepared["submissions"]
+    manifest = prepared["manifest"]
+    known_students = manifest["students"]
+
+    # failed students are not recorded, so they are tried again
+    for student_folder, error, stats in results:
+        student = os.path.basename(student_folder)
+
+        if error is None:
+            known_students[student] = {"files": submissions[student],
+                "pdf": os.path.isfile(merged_pdf_path(dir_name, student)),
+                "estimated_seconds": round(sum(
+                    prepared["estimates"][student].values()), 3),
+                "seconds": round(stats.get("student_seconds", 0), 3)}
+        else:
+            known_students.pop(student, None)
+
+    manifest["students"] = dict(sorted(known_students.items()))
+    manifest["settings"] = prepared["settings"]
+    write_json_atomic(manifest_path(dir_name), manifest)
+
+    # the run is finished, the manifest has everything now
+    os.remove(journal_path(dir_name))
+
+    if prepared["profiling"]:
+        events = list(prepared["trace_events"])
+
+        for student_folder, error, stats in results:
+            events += stats.get("trace_events", [])
+
+        profile_path = os.path.normpath(dir_name) + ".profile.json"
+        write_profile(profile_path, events)
+        print_profile_report(events)
+        print("\nProfile saved to " + profile_path + 
+            ", open it in chrome://tracing or https://ui.perfetto.dev")
+
+    return results
+
+
+def default_cost_model_path():
+    '''
+    Returns the default path of the cost model (see load_cost_model), in
+    the local application data on windows and in ~/.cache on other 
+    systems, next to the conversion cache.
+    '''
+
+    return os.path.join(os.path.dirname(default_cache_folder()), 
+        "reistee-cost-model.json" if os.name != "nt" else "cost-model.json")
+
+
+def load_cost_model(path):
+    '''
+    Loads what earlier runs measured for every kind of file in 
+    COST_RATES: a dict with the seconds estimated from COST_RATES alone
+    and the actual seconds of that kind of file summed over the last 
+    runs. Returns an empty dict if there is no cost model yet.
+
+    Parameters
+    ----------
+    path: Path of the cost model, "" for not using one
+    '''
+
+    try:
+        with open(path, encoding="utf-8") as cost_model:
+            return json.load(cost_model)["types"]
+
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def estimate_student(files, cost_model):
+    '''
+    Estimates how long processing a student takes, from the number, 
+    size and kind of their files (see COST_RATES), scaled by how the 
+    estimates compared to the actual times in earlier runs. Returns a 
+    dict of the estimated seconds for every kind of file.
+
+    Parameters
+    ----------
+    files: Files of the student, see read_submissions
+
+    cost_model: Measurements of earlier runs, see load_cost_model
+    '''
+
+    estimate = dict.fromkeys(COST_RATES, 0.0)
+    total_size = 0
+
+    for name, (size, digest) in files.items():
+        ext = os.path.splitext(name)[1].lower()
+        total_size += size
+
+        if ext in TEXT_ENDINGS:
+            kind = "text"
+        elif FILE_TYPES.get(ext) == PICTURES:
+            kind = "picture"
+        elif FILE_TYPES.get(ext) == DOCS:
+            kind = "doc"
+        else:
+            continue
+
+        seconds_per_file, mb_per_second = COST_RATES[kind]
+        estimate[kind] += (seconds_per_file + 
+            size / 1024 / 1024 / mb_per_second)
+
+    seconds_per_file, mb_per_second = COST_RATES["merge"]
+    estimate["merge"] = (seconds_per_file * len(files) + 
+        total_size / 1024 / 1024 / mb_per_second)
+
+    for kind in estimate:
+        estimate[kind] *= cost_scale(cost_model, kind)
+
+    return estimate
+
+
+def cost_scale(cost_model, kind):
+    '''
+    Returns how much longer than estimated from COST_RATES a kind of 
+    file took in earlier runs, 1 if there are no measurements yet.
+
+    Parameters
+    ----------
+    cost_model: Measurements of earlier runs, see load_cost_model
+
+    kind: Kind of file, see COST_RATES
+    '''
+
+    measured = cost_model.get(kind)
+
+    if measured is None or measured["estimated"] <= 0:
+        return 1.0
+
+    return min(max(measured["actual"] / measured["estimated"], 0.01), 100)
+
+
+def update_cost_model(path, cost_model, estimates, results):
+    '''
+    Adds the estimated and the actual seconds of every kind of file of 
+    the processed students to the cost model and saves it, so the next
+    estimates are closer. Older runs count less, so the model follows 
+    when e.g. LibreOffice gets faster.
+
+    Parameters
+    ----------
+    path: Path of the cost model, "" for not using one
+
+    cost_model: Measurements of earlier runs, see load_cost_model
+
+    estimates: List of the estimates of the students, see 
+    estimate_student
+
+    results: List of the results of the students, see run_student_jobs
+    '''
+
+    if not path:
+        return
+
+    for kind in COST_RATES:
+
+        # the estimates were scaled by the model, it is compared with 
+        # the estimates from COST_RATES alone
+        scale = cost_scale(cost_model, kind)
+
+        measured = cost_model.setdefault(kind, 
+            {"estimated": 0.0, "actual": 0.0})
+        estimated = actual = 0.0
+
+        for estimate, (student_folder, error, stats) in zip(estimates, 
+                results):
+            if error is not None or "student_seconds" not in stats:
+                continue
+
+            converted = sum(stats.get(name + "_seconds", 0) 
+                for name in ("picture", "doc", "text"))
+
+            estimated += estimate[kind] / scale
+            actual += (stats["student_seconds"] - converted 
+                if kind == "merge" else stats.get(kind + "_seconds", 0))
+
+        if estimated > 0:
+            measured["estimated"] = measured["estimated"] * 0.7 + estimated
+            measured["actual"] = measured["actual"] * 0.7 + actual
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_json_atomic(path, {"types": cost_model})
+
+    # e.g. written by another run at the same time, it is only an estimate
+    except OSError:
+        pass
+
+
+def print_progress(done, total, done_cost, total_cost, start):
+    '''
+    Prints how many students are finished and about how long the others
+    will take, over the previous progress line. The estimated time left
+    is scaled by how long the finished students actually took compared 
+    to their estimates. Prints nothing if the output is not a terminal.
+
+    Parameters
+    ----------
+    done: Number of finished students
+
+    total: Number of students
+
+    done_cost: Estimated seconds of the finished students
+
+    total_cost: Estimated seconds of all students
+
+    start: Time (time.perf_counter) the students were started
+    '''
+
+    if not sys.stdout.isatty():
+        return
+
+    line = "%d/%d students finished" % (done, total)
+
+    if 0 < done_cost < total_cost and done < total:
+        left = ((time.perf_counter() - start) * 
+            (total_cost - done_cost) / done_cost)
+        line += ", about %d:%02d min left" % divmod(round(left), 60)
+
+    print("\r" + line.ljust(50), end="\n" if done == total else "", 
+        flush=True)
+
+
+def results_zip_path(dir_name):
+    '''
+    Returns the path of the zip with all merged pdfs of an output 
+    folder, which is placed next to the folder, see OutputSinks.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    return os.path.normpath(dir_name) + ".zip"
+
+
+def class_pdf_path(dir_name):
+    '''
+    Returns the path of the pdf with the pdfs of all students of an 
+    output folder, which is placed next to the folder, see OutputSinks.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+    '''
+
+    return os.path.normpath(dir_name) + ".pdf"
+
+
+class OutputSinks:
+    '''
+    Writes the merged pdfs of the students of a source into a zip (see 
+    results_zip_path) and into one pdf for the whole class with a 
+    bookmark "lastname, firstname" for every student (see 
+    class_pdf_path), as soon as each student is finished. The workers 
+    send the pdfs they wrote (see return_pdfs), so the pdfs are not 
+    read again. The class pdf is written page by page with 
+    StreamingPdfWriter and its students are sorted when it is closed, 
+    so no pdf has to be kept in memory until the students before it 
+    are finished. Both are written to temporary files that only replace
+    the ones of the last run when finish is called, so a run that is 
+    interrupted leaves no half written zip or pdf behind.
+
+    Parameters
+    ----------
+    dir_name: Main dir, into which the merged pdfs are placed.
+
+    results_zip: Whether the zip is written
+
+    class_pdf: Whether the class pdf is written
+    '''
+
+    def __init__(self, dir_name, results_zip=False, class_pdf=False):
+        self.dir_name = dir_name
+        self.added = set()
+        self.zip_file = None
+        self.writer = None
+
+        if results_zip:
+            # pdfs are compressed already, so they are only stored
+            self.zip_file = zipfile.ZipFile(results_zip_path(dir_name) + 
+                ".part", "w", zipfile.ZIP_STORED)
+
+        if class_pdf:
+            self.writer = StreamingPdfWriter(class_pdf_path(dir_name))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is not None:
+            self.discard()
+
+
+    def add(self, student, pdf):
+        '''
+        Adds the merged pdf of a student.
+
+        Parameters
+        ----------
+        student: Name of the student folder
+
+        pdf: Content of the pdf as bytes, or its path
+        '''
+
+        name = reverse_student_name(student)
+        self.added.add(student)
+
+        if self.zip_file is not None:
+            if isinstance(pdf, str):
+                self.zip_file.write(pdf, name + ".pdf")
+            else:
+                self.zip_file.writestr(name + ".pdf", pdf)
+
+        if self.writer is not None:
+            if not isinstance(pdf, str):
+                pdf = io.BytesIO(pdf)
+
+            # e.g. a pdf PyPDF2 can't read, it is still in the zip
+            try:
+                self.writer.append(pdf, outline=name)
+
+            except Exception as error:
+                print("Can't add " + name + " to the class pdf: " + 
+                    str(error))
+
+
+    def finish(self, unchanged_students):
+        '''
+        Adds the pdfs of the students that were not processed in this 
+        run because they did not change (or were finished by the run 
+        that is resumed) from the output folder, and replaces the zip 
+        and class pdf of the last run.
+
+        Parameters
+        ----------
+        unchanged_students: Names of these students, see prepare_source.
+        The ones without merged pdf are left out.
+        '''
+
+        for student in sorted(unchanged_students):
+            pdf = merged_pdf_path(self.dir_name, student)
+
+            if student not in self.added and os.path.isfile(pdf):
+                self.add(student, pdf)
+
+        if self.zip_file is not None:
+            self.zip_file.close()
+            os.replace(results_zip_path(self.dir_name) + ".part", 
+                results_zip_path(self.dir_name))
+
+        if self.writer is not None:
+            self.writer.sort_outlines()
+            self.writer.close()
+
+
+    def discard(self):
+        '''
+        Closes and removes the temporary files, e.g. when the run was 
+        interrupted.
+        '''
+
+        if self.zip_file is not None:
+            self.zip_file.close()
+
+        if self.writer is not None:
+            self.writer.discard()
+
+        try:
+            os.remove(results_zip_path(self.dir_name) + ".part")
+        except OSError:
+            pass
+
+
+def merge_sources(sources, options, pool=None):
+    '''
+    Creates the merged pdfs for several zips or folders from IServ at 
+    once (see process_archive). The students of all sources are 
+    processed by the same worker processes, so python and LibreOffice 
+    are started only once. The students that are estimated to take 
+    longest are started first (see estimate_student), so the run does 
+    not end waiting for one large student, and the progress is shown 
+    while they are processed. The pdfs of the students go into the 
+    results zip and the class pdf of their source as soon as they are 
+    finished, if options ask for them (see OutputSinks). With more than
+    one source, a summary of every source is printed at the end. 
+    Returns a Report for every source.
+
+    Parameters
+    ----------
+    sources: List of tuples of the path of a zip or folder and the main
+    dir, into which its merged pdfs will be placed.
+
+    options: Options of the run, see Options
+
+    pool: Worker pool to use, see run_student_jobs. By default a pool 
+    with the settings of options is started for this run.
+    '''
+
+    run_profiler = Profiler() if options.profiling else None
+
+    prepared_sources = [prepare_source(source, dir_name, options, 
+        run_profiler) for source, dir_name in sources]
+
+    cost_model = load_cost_model(options.cost_model)
+    planned_jobs = []
+
+    for prepared in prepared_sources:
+        prepared["estimates"] = {}
+
+        for student_job in prepared["student_jobs"]:
+            student = os.path.basename(student_job[0])
+            estimate = estimate_student(prepared["submissions"][student], 
+                cost_model)
+            prepared["estimates"][student] = estimate
+            planned_jobs.append((sum(estimate.values()), student_job, 
+                prepared, estimate))
+
+    # longest first, so the short ones fill the gaps at the end
+    planned_jobs.sort(key=lambda planned_job: -planned_job[0])
+
+    costs = [planned_job[0] for planned_job in planned_jobs]
+    student_jobs = [planned_job[1] for planned_job in planned_jobs]
+
+    # the source of every student job, for recording finished students
+    job_sources = [planned_job[2] for planned_job in planned_jobs]
+    estimates = [planned_job[3] for planned_job in planned_jobs]
+
+    progress = {"done": 0, "cost": 0.0, "start": time.perf_counter()}
+
+    def on_result(index, result):
+        student_folder, error, stats = result
+
+        # the pdf is only passed on, it is not kept with the results
+        pdf_data = stats.pop("pdf_data", None)
+        sinks = job_sources[index]["sinks"]
+
+        # students that failed may have left a pdf, it is not added
+        if sinks is not None and error is None and pdf_data is not None:
+            sinks.add(os.path.basename(student_folder), pdf_data)
+
+        record_student(job_sources[index], result)
+        progress["done"] += 1
+        progress["cost"] += costs[index]
+        print_progress(progress["done"], len(student_jobs), 
+            progress["cost"], sum(costs), progress["start"])
+
+    with contextlib.ExitStack() as stack:
+
+        for prepared in prepared_sources:
+            prepared["sinks"] = None
+
+            if options.results_zip or options.class_pdf:
+                prepared["sinks"] = stack.enter_context(OutputSinks(
+                    prepared["dir_name"], options.results_zip, 
+                    options.class_pdf))
+
+        # the students always run in workers with the settings of 
+        # options, never in this process, whose settings may differ
+        if pool is None and len(student_jobs) > 0:
+            pool = stack.enter_context(create_worker_pool(
+                max(min(options.jobs, len(student_jobs)), 1), 
+                options.worker_settings()))
+
+        results = run_student_jobs(student_jobs, options.jobs, pool,
+            on_result)
+
+        for prepared in prepared_sources:
+            if prepared["sinks"] is not None:
+                prepared["sinks"].finish(prepared["unchanged_students"])
+
+    update_cost_model(options.cost_model, cost_model, estimates, results)
+
+    reports = []
+
+    for prepared in prepared_sources:
+        reports.append(Report(prepared, finish_source(prepared, 
+            [result for result, job_source in zip(results, job_sources) 
+                if job_source is prepared])))
+
+    if len(sources) > 1:
+        print("\nSummary:")
+
+        for report in reports:
+            print("  %s: %d students, %d processed, %d skipped, %d failed"
+                " -> %s" % (report.source.name, report.students, 
+                len(report.processed), len(report.skipped), 
+                len(report.failed), report.out_dir))
+
+    return reports
+
+
+class Options:
+    '''
+    Options of a run of process_archive. Every setting of WORKER_SETTINGS
+    is an attribute with the same name, e.g. image_dpi or 
+    converter_backend, which starts with the value the setting has in 
+    this module when the Options are created. Also:
+
+    jobs: Number of students that are processed at the same time.
+
+    stream: Whether zips are read directly instead of being extracted.
+
+    rebuild: Whether all students are processed, even if unchanged.
+
+    resume: Whether an interrupted run is continued, see prepare_source
+
+    cost_model: Path of the measurements for planning the run, see 
+    load_cost_model, "" for not using one
+
+    results_zip: Whether the merged pdfs are also put into a zip next 
+    to the output folder, see OutputSinks
+
+    class_pdf: Whether the merged pdfs are also put into one pdf for the
+    whole class next to the output folder, see OutputSinks
+    '''
+
+    def __init__(self, **options):
+        '''
+        Parameters
+        ----------
+        options: Values of the options that differ from the defaults, 
+        e.g. Options(jobs=4, image_dpi=150)
+        '''
+
+        self.jobs = 1
+        self.stream = False
+        self.rebuild = False
+        self.resume = False
+        self.cost_model = default_cost_model_path()
+        self.results_zip = False
+        self.class_pdf = False
+        self.__dict__.update(get_worker_settings())
+
+        for name, value in options.items():
+            if name not in self.__dict__:
+                raise TypeError("Unknown option: " + name)
+
+            setattr(self, name, value)
+
+
+    def worker_settings(self):
+        '''
+        Returns the settings for the worker processes, see 
+        get_worker_settings.
+        '''
+
+        settings = {name: getattr(self, name) for name in WORKER_SETTINGS}
+
+        # the workers only send the pdfs back if they are needed
+        settings["return_pdfs"] = self.results_zip or self.class_pdf
+
+        return settings
+
+
+class Report:
+    '''
+    What process_archive did with a zip or folder:
+
+    source: Path of the zip or folder
+
+    out_dir: Folder with the merged pdfs
+
+    students: Number of students in the source
+
+    processed: Names of the students whose pdf was created
+
+    skipped: Names of the students that were unchanged since the last 
+    run and not processed again
+
+    failed: Dict of the names of the students that could not be 
+    processed and the error message
+
+    pdfs: Dict of the names of the processed students and the path of 
+    their pdf, for students with anything that went into a pdf
+
+    results_zip: Path of the zip with all pdfs, None if not written
+
+    class_pdf: Path of the pdf of the whole class, None if not written
+
+    results: Results of the processed students, see run_student_jobs
+    '''
+
+    def __init__(self, prepared, results):
+        '''
+        Parameters
+        ----------
+        prepared: State of the source returned by prepare_source
+
+        results: Results of the student jobs of the source
+        '''
+
+        self.source = pathlib.Path(prepared["source"])
+        self.out_dir = pathlib.Path(prepared["dir_name"])
+        self.students = len(prepared["submissions"])
+        self.results = results
+        self.failed = {}
+        self.processed = []
+        self.pdfs = {}
+
+        for student_folder, error, stats in results:
+            student = os.path.basename(student_folder)
+
+            if error is not None:
+                self.failed[student] = error
+                continue
+
+            self.processed.append(student)
+            pdf = merged_pdf_path(prepared["dir_name"], student)
+
+            if os.path.isfile(pdf):
+                self.pdfs[student] = pathlib.Path(pdf)
+
+        sinks = prepared.get("sinks")
+        self.results_zip = None
+        self.class_pdf = None
+
+        if sinks is not None and sinks.zip_file is not None:
+            self.results_zip = pathlib.Path(results_zip_path(
+                prepared["dir_name"]))
+
+        if sinks is not None and sinks.writer is not None:
+            self.class_pdf = pathlib.Path(class_pdf_path(
+                prepared["dir_name"]))
+
+        done = set(self.processed) | set(self.failed)
+        self.skipped = [student for student in sorted(
+            prepared["submissions"]) if student not in done]
+
+
+def process_archives(sources, options=None, pool=None):
+    '''
+    Like process_archive, but for several zips or folders at once, 
+    which share the worker processes (see merge_sources). Returns a 
+    list with a Report for every source.
+
+    Parameters
+    ----------
+    sources: List of zips or folders, or of tuples of a zip or folder 
+    and the folder for its pdfs (None for the default)
+
+    options: Options of the run, see Options
+
+    pool: Worker pool to use, see run_student_jobs
+    '''
+
+    if options is None:
+        options = Options()
+
+    source_dirs = []
+
+    for source in sources:
+        out_dir = None
+        if isinstance(source, tuple):
+            source, out_dir = source
+
+        source = os.fspath(source)
+
+        # next to the source, not in the working directory
+        if out_dir is None:
+            out_dir = os.path.join(os.path.dirname(os.path.abspath(
+                source)), default_output_folder(source))
+
+        source_dirs.append((source, os.fspath(out_dir)))
+
+    return merge_sources(source_dirs, options, pool)
+
+
+def process_archive(source, out_dir=None, options=None):
+    '''
+    Creates the merged pdfs for all students of a zip or folder from 
+    IServ in out_dir and returns a Report. A manifest with the files of
+    every student is written next to out_dir. If out_dir was created by
+    an earlier run, only students whose files changed since then are 
+    processed again, the pdfs of all others stay untouched. Students 
+    that are no longer in source are reported. While profiling, the 
+    recorded steps are written to out_dir + ".profile.json" and the 
+    slowest are printed.
+
+    This is the entry point for using reistee as library. It does not
+    change the settings of this module or the working directory: the 
+    students are processed by worker processes that get the settings 
+    of options. So it can be called from several threads at the same 
+    time, as long as every call has its own out_dir.
+
+    Parameters
+    ----------
+    source: Path of the zip or folder, str or pathlib.Path
+
+    out_dir: Folder for the pdfs, by default next to the source (see 
+    default_output_folder)
+
+    options: Options of the run, see Options
+    '''
+
+    return process_archives([(source, out_dir)], options)[0]
+
+
+def default_output_folder(source):
+    '''
+    Returns the name of the folder for the pdfs of a zip or folder: its
+    name with " - reistee", without the file ending of a zip.
+
+    Parameters
+    ----------
+    source: Path of the zip or folder
+    '''
+
+    main_name_w_ext = os.path.basename(os.path.normpath(source))
+    main_name_wo_ext, main_ext = os.path.splitext(main_name_w_ext)
+
+    if os.path.isdir(source):
+        main_name_wo_ext = main_name_w_ext
+
+    return main_name_wo_ext + " - reistee"
+
+
+def watch_queue_path(folder):
+    '''
+    Returns the path of the queue of zips of a watched folder.
+
+    Parameters
+    ----------
+    folder: Watched folder
+    '''
+
+    return os.path.join(folder, ".reistee-queue.json")
+
+
+def load_watch_queue(folder):
+    '''
+    Returns the queue of zips of a watched folder, a dict with the 
+    zips as "zips": the name of every zip that was found and a dict of
+    its size, its modification time and its state, which is "queued",
+    "running", "done" or "failed". Zips that were running when reistee
+    was stopped are queued again.
+
+    Parameters
+    ----------
+    folder: Watched folder
+    '''
+
+    try:
+        with open(watch_queue_path(folder), encoding="utf-8") as queue_file:
+            watch_queue = json.load(queue_file)
+
+    except (OSError, ValueError):
+        watch_queue = {"zips": {}}
+
+    for entry in watch_queue["zips"].values():
+        if entry["state"] == "running":
+            entry["state"] = "queued"
+
+    return watch_queue
+
+
+def scan_watch_folder(folder, watch_queue, pending):
+    '''
+    Looks for new zips in a watched folder and adds the zips that are 
+    completely written to the queue. A zip counts as completely written
+    if its size and modification time did not change since the last 
+    scan and it can be opened. Zips already in the queue with the same
+    size and modification time are not added again, so no zip is 
+    processed twice. Returns whether zips were added.
+
+    Parameters
+    ----------
+    folder: Watched folder
+
+    watch_queue: Queue of the folder, see load_watch_queue
+
+    pending: Dict of the zips that were seen in earlier scans but are 
+    not queued yet, with their size and modification time. Updated by
+    this function.
+    '''
+
+    added = False
+    seen = set()
+
+    for entry in os.scandir(folder):
+        if not entry.is_file() or not entry.name.lower().endswith(".zip"):
+            continue
+
+        # results zips of earlier zips, see OutputSinks
+        if os.path.splitext(entry.name)[0].endswith(" - reistee"):
+            continue
+
+        stat = entry.stat()
+        signature = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        known = watch_queue["zips"].get(entry.name)
+        seen.add(entry.name)
+
+        if known is not None and known["size"] == signature["size"] and (
+                known["mtime"] == signature["mtime"]):
+            continue
+
+        if pending.get(entry.name) == signature and zipfile.is_zipfile(
+                entry.path):
+            watch_queue["zips"][entry.name] = dict(signature, 
+                state="queued")
+            del pending[entry.name]
+            added = True
+
+        else:
+            pending[entry.name] = signature
+
+    for name in set(pending) - seen:
+        del pending[name]
+
+    return added
+
+
+def watch_folder(folder, options=None, interval=2.0, scans=None):
+    '''
+    Watches a folder for new zips from IServ and creates the merged pdfs
+    of every zip as soon as it is completely downloaded, in a folder 
+    next to the zip (see default_output_folder). The zips waiting to be
+    processed are kept in a queue in the folder (see load_watch_queue),
+    which is saved after every change, so zips found before reistee 
+    was stopped are processed after a restart and no zip is processed 
+    twice. The worker processes and their converters are kept running 
+    between zips, so no zip has to wait for python or LibreOffice to 
+    start. Runs until interrupted with Ctrl+C.
+
+    Parameters
+    ----------
+    folder: Folder to watch, e.g. the downloads folder
+
+    options: Options of the run, see Options. Interrupted runs are 
+    always resumed, without changing the given options.
+
+    interval: Seconds between two scans of the folder
+
+    scans: Number of scans before returning, None for watching until 
+    interrupted. For testing.
+    '''
+
+    if options is None:
+        options = Options()
+
+    # work on a copy, so the options of the caller stay as they were
+    options = copy.copy(options)
+    options.resume = True
+    watch_queue = load_watch_queue(folder)
+    pending = {}
+    pool = create_worker_pool(max(options.jobs, 1), 
+        options.worker_settings())
+    scan = 0
+
+    print("Watching " + os.path.abspath(folder) + 
+        " for zips, stop with Ctrl+C.")
+
+    try:
+        while scans is None or scan < scans:
+            if scan > 0:
+                time.sleep(interval)
+            scan += 1
+
+            if scan_watch_folder(folder, watch_queue, pending):
+                write_json_atomic(watch_queue_path(folder), watch_queue)
+
+            queued = [name for name, entry in watch_queue["zips"].items()
+                if entry["state"] == "queued"]
+
+            if len(queued) == 0:
+                continue
+
+            for name in queued:
+                watch_queue["zips"][name]["state"] = "running"
+            write_json_atomic(watch_queue_path(folder), watch_queue)
+
+            sources = [(os.path.join(folder, name), 
+                os.path.join(folder, default_output_folder(name))) 
+                for name in queued]
+            state = "done"
+
+            try:
+                try:
+                    merge_sources(sources, options, pool)
+
+                # a worker crashed while processing an earlier zip, 
+                # start new workers and try again
+                except concurrent.futures.BrokenExecutor:
+                    pool.shutdown()
+                    pool = create_worker_pool(max(options.jobs, 1), 
+                        options.worker_settings())
+                    merge_sources(sources, options, pool)
+
+            except Exception:
+                print("Error while processing " + ", ".join(queued) + 
+                    ":\n" + traceback.format_exc())
+                state = "failed"
+
+            for name in queued:
+                watch_queue["zips"][name]["state"] = state
+            write_json_atomic(watch_queue_path(folder), watch_queue)
+
+            print("Finished " + ", ".join(queued) + 
+                ", waiting for new zips.")
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    '''
+    Reistee Extracts IServ - Teachers Easy Extractor
+    Autor: Marc Franke
+    Version: 0.00.787.49
+    
+    With reistee you can easily extract student solution zips
+    downloaded from IServ.
+    '''
+
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(prog="reistee",
+        description="Merges the files of every student in an IServ " +
+            "zip-file or folder into one pdf per student.")
+    parser.add_argument("source", nargs="*",
+        help="zip-files or folders downloaded from IServ, or patterns " +
+            "like *.zip. All students of all of them are processed " +
+            "together.")
+    parser.add_argument("-j", "--jobs", type=int, 
+        default=os.cpu_count() or 1,
+        help="number of students processed at the same time " +
+            "(default: number of cores)")
+    parser.add_argument("--converter", default=converter_backend,
+        choices=["auto", "libreoffice", "soffice", "word", "fake"],
+        help="how documents are converted: a running LibreOffice, " +
+            "LibreOffice started for every document, MS Word, or dummy " +
+            "pdfs for testing (default: auto)")
+    parser.add_argument("--conversion-slots", type=int,
+        help="number of documents converted at the same time by every " +
+            "job, each with its own LibreOffice (default: number of " +
+            "cores divided by jobs)")
+    parser.add_argument("--picture-threads", type=int,
+        help="number of pictures converted at the same time by every " +
+            "job (default: number of cores divided by jobs)")
+    parser.add_argument("--dpi", type=int, default=image_dpi,
+        help="scale pictures to A4 and downsample them to this " +
+            "resolution, e.g. 150 (default: keep full resolution)")
+    parser.add_argument("--jpeg-quality", type=int, default=jpeg_quality,
+        help="quality of jpeg pictures in the pdfs, 1-95 " +
+            "(default: %(default)s)")
+    parser.add_argument("--grayscale", action="store_true",
+        help="store pictures in grayscale")
+    parser.add_argument("--scan", choices=["gray", "bw"], default="",
+        help="make photos of worksheets look like scans: crop the " +
+            "background, even out the lighting and, with bw, store them " +
+            "in black and white, which makes them much smaller " +
+            "(needs numpy)")
+    parser.add_argument("--cache-dir", default=default_cache_folder(),
+        help="folder of the cache for converted files " +
+            "(default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=cache_size,
+        help="maximum size of the cache in MB (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+        help="don't use the cache for converted files")
+    parser.add_argument("--memory-budget", type=int, default=memory_budget,
+        help="students whose files are larger than this (in MB) are " +
+            "merged page by page, which needs less memory but is " +
+            "slower; 0 turns this off (default: %(default)s)")
+    parser.add_argument("--keep-duplicates", action="store_true",
+        help="put files a student uploaded several times into the pdf " +
+            "every time (default: only the first one)")
+    parser.add_argument("--archive-depth", type=int, 
+        default=archive_max_depth,
+        help="unpack zip, tar and 7z archives students uploaded, and " +
+            "archives inside them up to this depth; 0 turns this off " +
+            "(default: %(default)s)")
+    parser.add_argument("--archive-max-size", type=int, 
+        default=archive_max_bytes,
+        help="MB that are unpacked at most from the archives of a " +
+            "student (default: %(default)s)")
+    parser.add_argument("--archive-max-files", type=int, 
+        default=archive_max_members,
+        help="files that are unpacked at most from the archives of a " +
+            "student (default: %(default)s)")
+    parser.add_argument("--optimize", action="store_true",
+        help="make the pdfs smaller by storing identical fonts, images " +
+            "and pages only once, and linearize them (with pikepdf or " +
+            "qpdf installed), so they open faster on tablets")
+    parser.add_argument("--zip", action="store_true",
+        help="also put all pdfs into one zip next to the output folder, " +
+            "e.g. for uploading the corrections")
+    parser.add_argument("--class-pdf", action="store_true",
+        help="also put all pdfs into one pdf next to the output folder, " +
+            "with a bookmark for every student")
+    parser.add_argument("--stream", action="store_true",
+        help="read the files directly from the zip instead of " +
+            "extracting it first")
+    parser.add_argument("-o", "--output", 
+        help="folder for the pdfs (default: name of the zip-file or " +
+            "folder with \" - reistee\")")
+    parser.add_argument("--resume", action="store_true",
+        help="continue a run that was interrupted, without processing " +
+            "the students it already finished again")
+    parser.add_argument("--rebuild", action="store_true",
+        help="create the pdfs of all students again, even if their " +
+            "files did not change since the last run")
+    parser.add_argument("--watch", metavar="DIR",
+        help="keep running and process every zip that is downloaded " +
+            "into DIR, e.g. the downloads folder")
+    parser.add_argument("--profile", action="store_true",
+        help="record how long every step takes, print the slowest " +
+            "and save them for chrome://tracing next to the output")
+    args = parser.parse_args()
+
+    options = Options(jobs=args.jobs, stream=args.stream, 
+        rebuild=args.rebuild, resume=args.resume, results_zip=args.zip,
+        class_pdf=args.class_pdf,
+        converter_backend=args.converter,
+        conversion_slots=(args.conversion_slots or 
+            max((os.cpu_count() or 1) // max(args.jobs, 1), 1)),
+        picture_threads=(args.picture_threads or 
+            max((os.cpu_count() or 1) // max(args.jobs, 1), 1)),
+        memory_budget=args.memory_budget, optimize_pdfs=args.optimize,
+        keep_duplicates=args.keep_duplicates, image_dpi=args.dpi,
+        jpeg_quality=args.jpeg_quality, grayscale_images=args.grayscale,
+        scan_mode=args.scan, archive_max_depth=args.archive_depth,
+        archive_max_bytes=args.archive_max_size,
+        archive_max_members=args.archive_max_files,
+        profiling=args.profile, cache_size=args.cache_size,
+        cache_folder="" if args.no_cache else args.cache_dir)
+
+    if args.scan:
+        try:
+            import numpy
+
+        except ImportError:
+            parser.error("--scan needs numpy, install it with " +
+                "pip install numpy")
+
+    if args.watch:
+        if args.source or args.output:
+            parser.error("--watch can't be used with sources or --output")
+
+        watch_folder(args.watch, options)
+        sys.exit()
+
+    # Windows does not expand patterns like *.zip itself
+    sources = []
+    for source in args.source:
+        if os.path.exists(source):
+            sources.append(source)
+        else:
+            sources += sorted(glob.glob(source))
+
+    if len(sources) == 0:
+        parser.error("no zip-file or folder found")
 
-        extract_dir_name = main_name_wo_ext + " - reistee"
-        shutil.copytree(sys.argv[1], extract_dir_name)
+    if args.output and len(sources) > 1:
+        parser.error("--output can only be used with a single source")
 
-    create_merged_pdfs(extract_dir_name)
+    output_folders = [args.output or default_output_folder(source) 
+        for source in sources]
 
+    if len(set(output_folders)) < len(output_folders):
+        parser.error("several sources have the same name, process them " +
+            "one after another with --output")
 
+    process_archives(list(zip(sources, output_folders)), options)
@@ -0,0 +1,69 @@
+'''
+Shared fixtures for the tests. Run from the main folder of the
+repository with python -m pytest.
+'''
+
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+from fpdf import FPDF
+from PIL import Image
+
+# reistee is a single module in the main folder, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+
+def picture(format, color):
+    '''
+    Returns a small picture in format, e.g. "JPEG" or "PNG".
+    '''
+
+    data = io.BytesIO()
+    Image.new("RGB", (300, 400), color).save(data, format)
+    return data.getvalue()
+
+
+def pdf(pages):
+    '''
+    Returns a pdf with pages pages.
+    '''
+
+    document = FPDF()
+    document.set_font("Arial", size=11)
+
+    for page in range(pages):
+        document.add_page()
+        document.cell(0, 6, "Seite %d" % (page + 1))
+
+    return document.output(dest="S").encode("latin-1")
+
+
+@pytest.fixture
+def class_zip(tmp_path):
+    '''
+    Writes a small zip like an IServ download to tmp_path and returns its
+    path. "Anna Muster" has two photos, a pdf with two pages, a document
+    and a text file (6 pages with the fake converter), "Ben Beispiel" a
+    screenshot (1 page) and "Carla Chaos" only a file reistee does not
+    know.
+    '''
+
+    path = tmp_path / "Aufgabe 1.zip"
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("Anna Muster/IMG_0001.jpg", picture("JPEG", "red"))
+        archive.writestr("Anna Muster/Fotos/IMG_0002.jpg",
+            picture("JPEG", "blue"))
+        archive.writestr("Anna Muster/Aufgabe_1.pdf", pdf(2))
+        archive.writestr("Anna Muster/Lösung.odt", b"not converted")
+        archive.writestr("Anna Muster/Notizen.txt",
+            "Größere Werte".encode("cp1252"))
+        archive.writestr("Ben Beispiel/Bildschirmfoto.png",
+            picture("PNG", "white"))
+        archive.writestr("Carla Chaos/programm.exe", b"MZ")
+
+    return path
@@ -0,0 +1,372 @@
+'''
+Tests of the whole pipeline, with the fake converter, so no Office is
+needed.
+'''
+
+import io
+import os
+import zipfile
+
+import pytest
+from PyPDF2 import PdfReader
+from PyPDF2.errors import PdfReadError
+
+import reistee
+from conftest import pdf, picture
+
+
+def options(**settings):
+    '''
+    Returns Options for the tests: fake converter, no conversion cache
+    and no cost model, so nothing outside tmp_path is written.
+    '''
+
+    return reistee.Options(converter_backend="fake", cache_folder="",
+        cost_model="", **settings)
+
+
+def page_count(path):
+    '''
+    Returns the number of pages of a pdf.
+    '''
+
+    with open(path, "rb") as pdf:
+        return len(PdfReader(pdf).pages)
+
+
+def test_process_archive(class_zip, tmp_path):
+    out_dir = tmp_path / "out"
+
+    report = reistee.process_archive(class_zip, out_dir, options())
+
+    assert report.students == 3
+    assert sorted(report.processed) == ["Anna Muster", "Ben Beispiel",
+        "Carla Chaos"]
+    assert report.failed == {}
+    assert report.skipped == []
+
+    assert report.pdfs == {
+        "Anna Muster": out_dir / "Muster, Anna.pdf",
+        "Ben Beispiel": out_dir / "Beispiel, Ben.pdf"}
+    assert page_count(report.pdfs["Anna Muster"]) == 6
+    assert page_count(report.pdfs["Ben Beispiel"]) == 1
+
+    # files with unknown format are copied, named like the pdf
+    assert (out_dir / "Chaos, Carla.exe").read_bytes() == b"MZ"
+
+    # unchanged students are not processed again
+    report = reistee.process_archive(class_zip, out_dir, options())
+
+    assert report.processed == []
+    assert report.skipped == ["Anna Muster", "Ben Beispiel", "Carla Chaos"]
+
+
+def test_watch_folder(class_zip, tmp_path):
+
+    # the zip is queued in the second scan, when it did not change since
+    # the first one, and processed right away
+    watch_options = options()
+    reistee.watch_folder(tmp_path, watch_options, interval=0.01, scans=3)
+
+    # the options of the caller are not changed
+    assert not watch_options.resume
+
+    out_dir = tmp_path / "Aufgabe 1 - reistee"
+    assert page_count(out_dir / "Muster, Anna.pdf") == 6
+    assert page_count(out_dir / "Beispiel, Ben.pdf") == 1
+
+    watch_queue = reistee.load_watch_queue(tmp_path)
+    assert {name: entry["state"] for name, entry in
+        watch_queue["zips"].items()} == {"Aufgabe 1.zip": "done"}
+
+    # a restart does not process the zip again
+    (out_dir / "Muster, Anna.pdf").unlink()
+    reistee.watch_folder(tmp_path, options(), interval=0.01, scans=3)
+    assert not (out_dir / "Muster, Anna.pdf").exists()
+
+
+def student_zip(files):
+    '''
+    Returns a zip a student uploaded with files, a dict of names and 
+    contents.
+    '''
+
+    data = io.BytesIO()
+
+    with zipfile.ZipFile(data, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+
+    return data.getvalue()
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_archive_path_traversal(tmp_path, stream):
+    path = tmp_path / "Aufgabe 2.zip"
+    out_dir = tmp_path / "out"
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("Anna Muster/Abgabe.zip", student_zip({
+            "Bild.jpg": picture("JPEG", "red"),
+            "../../../../evil.exe": b"MZ"}))
+
+    report = reistee.process_archive(path, out_dir, options(stream=stream))
+
+    assert report.failed == {}
+    assert page_count(out_dir / "Muster, Anna.pdf") == 1
+
+    # names inside the archive are never used as paths
+    assert (out_dir / "Muster, Anna.exe").read_bytes() == b"MZ"
+    assert list(tmp_path.rglob("evil*")) == []
+
+
+def test_archive_limits(tmp_path, monkeypatch):
+    archive = str(tmp_path / "Abgabe.zip")
+
+    with open(archive, "wb") as archive_file:
+        archive_file.write(student_zip({"Seite 1.pdf": pdf(1), 
+            "Seite 2.pdf": pdf(1), "Seite 3.pdf": pdf(1)}))
+
+    budget = reistee.new_archive_budget()
+    members = reistee.expand_archive(archive, budget)
+    assert [member.name for member in members] == [
+        archive + "/Seite 1.pdf", archive + "/Seite 2.pdf", 
+        archive + "/Seite 3.pdf"]
+    assert budget["members"] == reistee.archive_max_members - 3
+    reistee.close_archives(budget)
+
+    # archives with too many or too large files are kept as they are
+    monkeypatch.setattr(reistee, "archive_max_members", 2)
+    budget = reistee.new_archive_budget()
+    assert reistee.expand_archive(archive, budget) == [archive]
+    assert budget["members"] == 2
+    reistee.close_archives(budget)
+
+    monkeypatch.setattr(reistee, "archive_max_members", 1000)
+    monkeypatch.setattr(reistee, "archive_max_bytes", 0)
+    budget = reistee.new_archive_budget()
+    assert reistee.expand_archive(archive, budget) == [archive]
+    reistee.close_archives(budget)
+
+
+def test_streaming_pdf_writer(tmp_path):
+    path = str(tmp_path / "Klasse.pdf")
+
+    with reistee.StreamingPdfWriter(path) as writer:
+        writer.append(io.BytesIO(pdf(2)), outline="Muster, Anna")
+        writer.append(io.BytesIO(pdf(1)), outline="Beispiel, Ben")
+        writer.sort_outlines()
+
+    assert page_count(path) == 3
+
+    with open(path, "rb") as class_pdf:
+        assert [outline.title for outline in 
+            PdfReader(class_pdf).outline] == ["Beispiel, Ben", 
+            "Muster, Anna"]
+
+    # a failing input leaves the pdf of the last time as it was
+    with pytest.raises(PdfReadError):
+        with reistee.StreamingPdfWriter(path) as writer:
+            writer.append(io.BytesIO(pdf(1)))
+            writer.append(io.BytesIO(b"not a pdf"))
+
+    assert page_count(path) == 3
+    assert sorted(tmp_path.iterdir()) == [tmp_path / "Klasse.pdf"]
+
+
+def test_optimize(class_zip, tmp_path):
+    out_dir = tmp_path / "out"
+
+    report = reistee.process_archive(class_zip, out_dir, 
+        options(optimize_pdfs=True))
+
+    assert report.failed == {}
+    assert page_count(out_dir / "Muster, Anna.pdf") == 6
+    assert page_count(out_dir / "Beispiel, Ben.pdf") == 1
+
+    # a failing input leaves no pdf and no temporary file behind
+    failed_dir = tmp_path / "failed"
+    failed_dir.mkdir()
+
+    with pytest.raises(PdfReadError):
+        reistee.optimize_pdf(str(failed_dir / "Muster, Anna.pdf"), 
+            [io.BytesIO(pdf(1)), io.BytesIO(b"not a pdf")])
+
+    assert list(failed_dir.iterdir()) == []
+
+
+def test_conversion_cache_eviction(tmp_path):
+    cache = reistee.ConversionCache(str(tmp_path), 100)
+
+    cache.store("aa1", b"a" * 40)
+    cache.store("bb2", b"b" * 40)
+
+    # the second entry was used longest ago, after the first was looked
+    # up again
+    os.utime(cache.entry_path("aa1"), (1000, 1000))
+    os.utime(cache.entry_path("bb2"), (2000, 2000))
+    assert cache.lookup("aa1") == b"a" * 40
+
+    cache.store("cc3", b"c" * 40)
+
+    assert cache.lookup("bb2") is None
+    assert cache.lookup("aa1") == b"a" * 40
+    assert cache.lookup("cc3") == b"c" * 40
+    assert cache.take_stats() == {"cache_hits": 3, "cache_misses": 1}
+
+    # entries larger than the whole cache are not stored
+    cache.store("dd4", b"d" * 101)
+    assert cache.lookup("dd4") is None
+
+
+def test_file_category(tmp_path):
+    assert reistee.file_category("IMG_0001.JPG") == reistee.PICTURES
+    assert reistee.file_category("Scan.Pdf") == reistee.PDFS
+    assert reistee.file_category("Aufsatz.DOCX") == reistee.DOCS
+    assert reistee.file_category("programm.exe") is None
+
+    # files without or with a wrong ending are recognized by content
+    contents = {"Bild": picture("PNG", "red"), "Scan.dat": pdf(1),
+        "Aufsatz": student_zip({"word/document.xml": b"<w:document/>"}),
+        "Archiv": student_zip({"Bild.jpg": picture("JPEG", "red")}),
+        "programm": b"MZ"}
+
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+
+    assert {name: reistee.file_category(name, str(tmp_path / name)) 
+        for name in contents} == {"Bild": reistee.PICTURES, 
+        "Scan.dat": reistee.PDFS, "Aufsatz": reistee.DOCS, 
+        "Archiv": None, "programm": None}
+
+
+def test_skip_duplicates(tmp_path, monkeypatch):
+    photo = picture("JPEG", "red")
+    files = {"Seite 10.jpg": photo, "Seite 2.jpg": photo, 
+        "Seite 3.jpg": picture("JPEG", "blue"), "Seite 1.pdf": pdf(1)}
+
+    for name, content in files.items():
+        (tmp_path / name).write_bytes(content)
+
+    def file_lists():
+        return ([str(tmp_path / "Seite 10.jpg"), 
+            str(tmp_path / "Seite 3.jpg"), str(tmp_path / "Seite 2.jpg")],
+            [str(tmp_path / "Seite 1.pdf")], [])
+
+    # the copy that comes later in natural order is skipped
+    skipped = file_lists()
+    reistee.skip_duplicates(str(tmp_path), skipped)
+    assert skipped == ([str(tmp_path / "Seite 2.jpg"), 
+        str(tmp_path / "Seite 3.jpg")], [str(tmp_path / "Seite 1.pdf")], 
+        [])
+
+    monkeypatch.setattr(reistee, "keep_duplicates", True)
+    kept = file_lists()
+    reistee.skip_duplicates(str(tmp_path), kept)
+    assert kept[0] == [str(tmp_path / "Seite 2.jpg"), 
+        str(tmp_path / "Seite 3.jpg"), str(tmp_path / "Seite 10.jpg")]
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "utf-16", 
+    "utf-16-le", "utf-16-be", "cp1252"])
+def test_decode_text(encoding):
+    text = "Größere Werte – 5 €"
+    data = text.encode(encoding)
+
+    # utf-16 without byte order mark is only known by the mark
+    if encoding in ("utf-16-le", "utf-16-be"):
+        data = "\ufeff".encode(encoding) + data
+
+    assert reistee.decode_text(data) == text
+
+
+def test_text_content(tmp_path):
+    assert reistee.text_content("a\r\nb\rc\n".encode("cp1252")) == (
+        "a\nb\nc\n")
+
+    (tmp_path / "Notizen.txt").write_bytes("Größere Werte".encode(
+        "cp1252"))
+    (tmp_path / "Привет.txt").write_text("Привет", encoding="utf-16")
+
+    # texts the fonts of text_to_page can't show go to the converter
+    assert reistee.text_fits_fonts(str(tmp_path / "Notizen.txt"))
+    assert not reistee.text_fits_fonts(str(tmp_path / "Привет.txt"))
+
+
+def test_resume(class_zip, tmp_path, monkeypatch):
+    out_dir = tmp_path / "out"
+    record_student = reistee.record_student
+    students = {"Anna Muster", "Ben Beispiel", "Carla Chaos"}
+
+    def interrupted_run(**settings):
+        '''
+        Runs reistee with settings until the first student is finished 
+        and returns the name of the student.
+        '''
+
+        finished = []
+
+        def record_and_stop(prepared, result):
+            record_student(prepared, result)
+            finished.append(os.path.basename(result[0]))
+            raise KeyboardInterrupt
+
+        with monkeypatch.context() as patch:
+            patch.setattr(reistee, "record_student", record_and_stop)
+
+            with pytest.raises(KeyboardInterrupt):
+                reistee.process_archive(class_zip, out_dir, 
+                    options(**settings))
+
+        assert os.path.isfile(reistee.journal_path(str(out_dir)))
+        return finished[0]
+
+    # with resume, the finished student is not processed again
+    finished = interrupted_run()
+    report = reistee.process_archive(class_zip, out_dir, 
+        options(resume=True))
+
+    assert report.skipped == [finished]
+    assert sorted(report.processed) == sorted(students - {finished})
+    assert not os.path.exists(reistee.journal_path(str(out_dir)))
+    assert page_count(out_dir / "Muster, Anna.pdf") == 6
+
+    # otherwise the run is started over, also for students the
+    # interrupted run removed the outputs of
+    interrupted_run(rebuild=True)
+    report = reistee.process_archive(class_zip, out_dir, options())
+
+    assert sorted(report.processed) == sorted(students)
+    assert (out_dir / "Chaos, Carla.exe").read_bytes() == b"MZ"
+    assert not os.path.exists(reistee.journal_path(str(out_dir)))
+
+
+def test_failed_students_not_in_outputs(class_zip, tmp_path):
+    out_dir = tmp_path / "out"
+    settings = {"results_zip": True, "class_pdf": True}
+
+    report = reistee.process_archive(class_zip, out_dir, options(**settings))
+
+    with zipfile.ZipFile(report.results_zip) as results_zip:
+        assert sorted(results_zip.namelist()) == ["Beispiel, Ben.pdf", 
+            "Muster, Anna.pdf"]
+
+    assert page_count(report.class_pdf) == 7
+
+    # a broken pdf is added for Ben, the pdf of the last run is removed
+    with zipfile.ZipFile(class_zip, "a") as archive:
+        archive.writestr("Ben Beispiel/Aufgabe.pdf", b"%PDF-1.4 broken")
+
+    report = reistee.process_archive(class_zip, out_dir, options(**settings))
+
+    assert list(report.failed) == ["Ben Beispiel"]
+    assert report.skipped == ["Anna Muster", "Carla Chaos"]
+
+    with zipfile.ZipFile(report.results_zip) as results_zip:
+        assert results_zip.namelist() == ["Muster, Anna.pdf"]
+
+    with open(report.class_pdf, "rb") as class_pdf:
+        reader = PdfReader(class_pdf)
+        assert len(reader.pages) == 6
+        assert [outline.title for outline in reader.outline] == [
+            "Muster, Anna"]